@@ -1,7 +1,26 @@
 import argparse
 import sys
+from pathlib import Path
 
-from herbert.commands import extract, ocr
+from herbert.commands import extract, mock_api, ocr, ocr_bench, ocr_eval, ocr_experiment
+from herbert.dedup import DEFAULT_MAX_DISTANCE
+from herbert.log import configure_logging
+
+
+def add_mock_options(parser):
+    """Latency and failure knobs shared by mock-api and ocr-bench."""
+    parser.add_argument("--latency", type=float, default=2.0, help="Median response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Log-normal sigma applied to latencies")
+    parser.add_argument("--ttft", type=float, default=0.8, help="Median time to first streamed token")
+    parser.add_argument("--tokens-per-sec", type=float, default=60.0, help="Streaming generation speed")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--overload", type=float, default=0.0, help="Fraction of requests answered with 529")
+    parser.add_argument(
+        "--transcripts",
+        default="output/txt" if Path("output/txt").is_dir() else None,
+        help="Directory of .txt pages returned as canned transcripts (default: output/txt if present)",
+    )
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible latencies and failures")
 
 
 def main():
@@ -9,11 +28,33 @@ def main():
         prog="herbert",
         description="Herbert Holloway Journal Processing CLI",
     )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="count",
+        default=0,
+        help="Show debug diagnostics",
+    )
+    parser.add_argument(
+        "-q", "--quiet",
+        action="count",
+        default=0,
+        help="Only show warnings (-qq: errors only)",
+    )
+    parser.add_argument(
+        "--log-json",
+        metavar="PATH",
+        help="Also write log records as JSON lines to PATH",
+    )
     subparsers = parser.add_subparsers(dest="command")
 
     # extract subcommand
     p_extract = subparsers.add_parser("extract", help="Extract data")
     p_extract.add_argument("source_file", help="Path to input .docx file")
+    p_extract.add_argument(
+        "--assets",
+        action="store_true",
+        help="Also write minified, content-hashed and precompressed copies to output/site",
+    )
     p_extract.set_defaults(func=extract.run)
 
     # ocr subcommand
@@ -25,14 +66,189 @@ def main():
         default="",
         help="Optional label appended to output filenames (e.g. 'test1')",
     )
+    p_ocr.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream responses to .partial files and record time-to-first-token per model",
+    )
+    p_ocr.add_argument(
+        "--cascade",
+        action="store_true",
+        help="OCR with the cheaper model first and only escalate flagged pages",
+    )
+    p_ocr.add_argument(
+        "--tiles",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Split each page into N overlapping bands and OCR them concurrently",
+    )
+    p_ocr.add_argument(
+        "--hint-sheet",
+        action="store_true",
+        help="Send the hint crops as one numbered contact-sheet image",
+    )
+    p_ocr.add_argument(
+        "--html",
+        action="store_true",
+        help="Render each transcript into site pages under output/ocr_site as it completes",
+    )
+    p_ocr.add_argument(
+        "--comments",
+        metavar="DOCX",
+        help="With --html, link the comments from this journal .docx/.odt into the pages",
+    )
+    p_ocr.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        metavar="N",
+        help="OCR up to N pages in parallel",
+    )
+    p_ocr.add_argument(
+        "--model",
+        action="append",
+        default=[],
+        metavar="FAMILY=ID",
+        help="Pin a model family to a specific model ID (repeatable), e.g. opus=claude-opus-4-1-20250805",
+    )
+    p_ocr.add_argument(
+        "--refresh-models",
+        action="store_true",
+        help="Refetch the model list instead of using the cached registry",
+    )
+    p_ocr.add_argument(
+        "--count-tokens",
+        action="store_true",
+        help="Preflight input tokens with the token-counting endpoint instead of a local estimate",
+    )
+    p_ocr.add_argument(
+        "--dedup",
+        action="store_true",
+        help="OCR one page per group of near-duplicate scans and copy its transcript to the rest",
+    )
+    p_ocr.add_argument(
+        "--dedup-bits",
+        type=int,
+        default=DEFAULT_MAX_DISTANCE,
+        metavar="BITS",
+        help=f"Perceptual hash distance under which --dedup treats scans as the same page "
+             f"(default {DEFAULT_MAX_DISTANCE})",
+    )
+    p_ocr.add_argument(
+        "--rerun-worst",
+        type=int,
+        metavar="N",
+        help="Only re-OCR the N page/model pairs with the worst stored ocr-eval CER",
+    )
+    p_ocr.add_argument(
+        "--rerun-below",
+        type=float,
+        metavar="CER",
+        help="Only re-OCR page/model pairs falling below this quality bar, i.e. whose stored CER is "
+             "above it, e.g. 0.05",
+    )
     p_ocr.set_defaults(func=ocr.run)
 
+    # ocr-eval subcommand
+    p_eval = subparsers.add_parser("ocr-eval", help="Score OCR output against the manual transcript")
+    p_eval.add_argument(
+        "--ocr-dir",
+        default="output/ocr_pages",
+        help="Directory of pageNNN_<model>[_label].txt OCR outputs",
+    )
+    p_eval.add_argument(
+        "--ref-dir",
+        default="output/txt",
+        help="Directory of manually transcribed pageNNN.txt pages",
+    )
+    p_eval.add_argument(
+        "--json",
+        default="output/ocr_eval.json",
+        help="Where to save per-page and per-model scores",
+    )
+    p_eval.add_argument(
+        "--hotspots",
+        type=int,
+        default=3,
+        help="Number of worst lines to report per page (shown with -v)",
+    )
+    p_eval.set_defaults(func=ocr_eval.run)
+
+    # mock-api subcommand
+    p_mock = subparsers.add_parser("mock-api", help="Serve a local stand-in for the Anthropic API")
+    p_mock.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    p_mock.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    add_mock_options(p_mock)
+    p_mock.set_defaults(func=mock_api.run)
+
+    # ocr-bench subcommand
+    p_bench = subparsers.add_parser("ocr-bench", help="Measure OCR throughput against the mock API")
+    p_bench.add_argument("source_dir", help="Directory of page images to OCR")
+    p_bench.add_argument(
+        "--concurrency",
+        default="1,2,4,8",
+        help="Comma-separated concurrency levels to compare",
+    )
+    p_bench.add_argument("--stream", action="store_true", help="Benchmark streaming requests")
+    add_mock_options(p_bench)
+    p_bench.set_defaults(func=ocr_bench.run)
+
+    # ocr-experiment subcommand
+    p_exp = subparsers.add_parser("ocr-experiment",
+                                  help="Compare OCR prompt/hint/model variants against the manual transcript")
+    p_exp.add_argument("source_dir", help="Directory of page images to OCR")
+    p_exp.add_argument(
+        "--prompts",
+        nargs="+",
+        default=["data/ocr_prompt.txt"],
+        metavar="FILE",
+        help="Prompt files to compare",
+    )
+    p_exp.add_argument(
+        "--hints",
+        nargs="+",
+        default=["data/ocr_hints", "none"],
+        metavar="DIR",
+        help="Hint directories to compare ('none' for no hints)",
+    )
+    p_exp.add_argument(
+        "--models",
+        default="sonnet,opus",
+        help="Comma-separated model families to compare",
+    )
+    p_exp.add_argument(
+        "--parallel",
+        type=int,
+        default=4,
+        help="Number of variants to run at the same time",
+    )
+    p_exp.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of pages to OCR in parallel within each variant",
+    )
+    p_exp.add_argument(
+        "--rate-limit",
+        type=float,
+        metavar="RPM",
+        help="Maximum API requests per minute for each variant",
+    )
+    p_exp.add_argument(
+        "--ref-dir",
+        default="output/txt",
+        help="Directory of manually transcribed pageNNN.txt pages",
+    )
+    p_exp.set_defaults(func=ocr_experiment.run)
+
     args = parser.parse_args()
 
     if not hasattr(args, "func"):
         parser.print_help()
         sys.exit(1)
 
+    configure_logging(args.verbose - args.quiet, args.log_json)
     args.func(args)
 
 
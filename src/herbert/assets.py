@@ -0,0 +1,158 @@
+"""
+Build cache-friendly site assets from the extract output.
+
+Every HTML page and comments JSON file is minified, written under a
+content-hash filename (page001.3f9c2e1a7b04.html) so it can be served with
+an immutable cache header, and precompressed to .gz and, when the optional
+brotli package is installed, .br variants next to it. manifest.json maps the
+logical names the site asks for to the hashed files.
+"""
+import gzip
+import hashlib
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from herbert.log import get_logger
+
+log = get_logger("assets")
+
+# Optional dependency: only needed for .br variants (pip install herbert[assets])
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+HASH_LENGTH = 12
+MANIFEST_NAME = "manifest.json"
+
+
+# Whitespace next to these tags is never rendered; around inline tags (<a>) it is text
+BLOCK_TAGS = "html|head|body|meta|link|title|script|style|div|p|br|ul|ol|li|h[1-6]|table|tr|td|th"
+
+
+def minify_html(html: str) -> str:
+    """Collapse whitespace runs to one space and drop whitespace before/after block tags."""
+    html = re.sub(r"\s+", " ", html.strip())
+    return re.sub(r" ?(</?(?:" + BLOCK_TAGS + r")\b[^<>]*>) ?", r"\1", html)
+
+
+def minify_json(text: str) -> str:
+    """Re-serialize JSON without indentation or spaces after separators."""
+    return json.dumps(json.loads(text), ensure_ascii=False, separators=(",", ":"))
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(logical: str, data: bytes) -> str:
+    """"html/page001.html" -> "html/page001.<hash>.html"."""
+    path = Path(logical)
+    return str(path.with_name(f"{path.stem}.{content_hash(data)}{path.suffix}").as_posix())
+
+
+def _build_one(source: Path, logical: str, site_dir: Path) -> dict:
+    """Minify, hash and precompress one file; returns its manifest entry."""
+    text = source.read_text(encoding="utf-8")
+    minified = minify_html(text) if source.suffix == ".html" else minify_json(text)
+    data = minified.encode("utf-8")
+    name = hashed_name(logical, data)
+    target = site_dir / name
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    entry = {"file": name, "bytes": len(data), "source_bytes": source.stat().st_size}
+    if not target.exists():
+        target.write_bytes(data)
+    # mtime=0 keeps the .gz byte-identical between builds of the same content
+    gz_data = gzip.compress(data, compresslevel=9, mtime=0)
+    Path(f"{target}.gz").write_bytes(gz_data)
+    entry["gzip_bytes"] = len(gz_data)
+    if brotli is not None:
+        br_data = brotli.compress(data, quality=11)
+        Path(f"{target}.br").write_bytes(br_data)
+        entry["brotli_bytes"] = len(br_data)
+    return entry
+
+
+def collect_sources(output_dir: Path) -> dict:
+    """Logical name -> source path for every asset the site serves."""
+    output_dir = Path(output_dir)
+    sources = {}
+    for path in sorted((output_dir / "html").glob("*.html")):
+        sources[f"html/{path.name}"] = path
+    for path in sorted(output_dir.glob("*.comments.json")):
+        sources[path.name] = path
+    comments_dir = output_dir / "comments"
+    if comments_dir.is_dir():
+        for path in sorted(comments_dir.rglob("*.json")):
+            sources[f"comments/{path.relative_to(comments_dir).as_posix()}"] = path
+    return sources
+
+
+def _prune(site_dir: Path, old_manifest: dict, new_manifest: dict) -> int:
+    """Delete hashed files from the previous build that are no longer referenced."""
+    keep = {entry["file"] for entry in new_manifest.values()}
+    removed = 0
+    for entry in old_manifest.values():
+        if entry["file"] in keep:
+            continue
+        for path in (site_dir / entry["file"], Path(f"{site_dir / entry['file']}.gz"),
+                     Path(f"{site_dir / entry['file']}.br")):
+            if path.exists():
+                path.unlink()
+                removed += 1
+    return removed
+
+
+def build_assets(output_dir: Path, site_dir: Path = None, workers: int = None) -> Path:
+    """
+    Build hashed, minified and precompressed copies of the extract output.
+
+    Args:
+        output_dir: The extract output directory (html/, *.comments.json, comments/)
+        site_dir: Where to write the assets and manifest (default: <output_dir>/site)
+        workers: Compression threads (default: ThreadPoolExecutor's default)
+    Returns the manifest path.
+    """
+    output_dir = Path(output_dir)
+    site_dir = Path(site_dir) if site_dir else output_dir / "site"
+    site_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = site_dir / MANIFEST_NAME
+
+    sources = collect_sources(output_dir)
+    if not sources:
+        log.warning("No HTML or comments JSON found in %s; nothing to build", output_dir)
+        return manifest_path
+    if brotli is None:
+        log.warning("brotli is not installed; writing .gz variants only (pip install 'herbert[assets]')")
+
+    started = time.time()
+    # zlib and brotli release the GIL, so threads compress files in parallel
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {logical: pool.submit(_build_one, path, logical, site_dir)
+                   for logical, path in sources.items()}
+        manifest = {logical: future.result() for logical, future in futures.items()}
+
+    old_manifest = {}
+    if manifest_path.exists():
+        old_manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    removed = _prune(site_dir, old_manifest, manifest)
+
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    tmp_path.replace(manifest_path)
+
+    source_bytes = sum(e["source_bytes"] for e in manifest.values())
+    minified_bytes = sum(e["bytes"] for e in manifest.values())
+    gzip_bytes = sum(e["gzip_bytes"] for e in manifest.values())
+    log.info("📦 Built %d assets in %.2fs -> %s", len(manifest), time.time() - started, site_dir)
+    log.info("  %d bytes -> %d minified, %d gzip%s", source_bytes, minified_bytes, gzip_bytes,
+             f", {sum(e['brotli_bytes'] for e in manifest.values())} brotli" if brotli is not None else "")
+    if removed:
+        log.debug("Removed %d stale asset files", removed)
+    log.info("  Manifest saved to %s", manifest_path)
+    return manifest_path
@@ -0,0 +1,100 @@
+"""
+OCR throughput benchmark against the local mock API.
+
+Starts herbert.mock_api in-process, points the Anthropic SDK at it and
+runs run_ocr over the same pages at several concurrency levels. Because
+the mock's latency model is fixed, differences between levels come from
+herbert's own request handling rather than API variance or cost. The runs
+write to a temporary output directory, so mock transcripts and reports never
+mix with real ones; only the benchmark summary is kept.
+"""
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from herbert.log import get_logger
+from herbert.metrics import REPORT_DIR, percentile
+from herbert.mock_api import MockConfig, start_server
+
+log = get_logger("bench")
+
+
+def run_bench(source_dir: str, levels: list, config: MockConfig, stream: bool = False,
+              report_dir: Path = REPORT_DIR) -> dict:
+    """
+    Run run_ocr once per concurrency level against the mock API.
+
+    Returns (and writes to report_dir) a JSON summary with pages/min and
+    latency percentiles per level.
+    """
+    # Imported here so the SDK picks up the mock base URL set below
+    from herbert.ocr import run_ocr
+
+    server, base_url = start_server(config)
+    saved_env = {k: os.environ.get(k) for k in ("ANTHROPIC_BASE_URL", "ANTHROPIC_API_KEY")}
+    os.environ["ANTHROPIC_BASE_URL"] = base_url
+    os.environ["ANTHROPIC_API_KEY"] = "mock-key"
+    log.info("🏁 Benchmarking %s against mock API at %s, concurrency %s",
+             source_dir, base_url, ", ".join(str(n) for n in levels))
+
+    results = []
+    scratch = tempfile.TemporaryDirectory(prefix="herbert-bench-")
+    try:
+        for level in levels:
+            # A fresh output root per level, so no level inherits max_tokens history or caches
+            metrics = run_ocr(source_dir, f"bench_c{level}", stream=stream, concurrency=level,
+                              output_root=Path(scratch.name) / f"c{level}")
+            summary = metrics.summary()
+            latencies = [r["latency"] for r in metrics.requests if r["ok"]]
+            results.append({
+                "concurrency": level,
+                "pages": summary["pages"],
+                "requests": summary["requests"],
+                "elapsed_sec": summary["elapsed_sec"],
+                "pages_per_min": summary["pages_per_min"],
+                "latency": {f"p{pct}": percentile(latencies, pct) for pct in (50, 95, 99)},
+                "retries": sum(r["retries"] for r in metrics.requests),
+                "failed": sum(1 for r in metrics.requests if not r["ok"]),
+            })
+    finally:
+        scratch.cleanup()
+        server.shutdown()
+        server.server_close()
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    report = {
+        "source_dir": str(source_dir),
+        "stream": stream,
+        "mock": {
+            "latency_median": config.latency_median,
+            "latency_sigma": config.latency_sigma,
+            "ttft_median": config.ttft_median,
+            "tokens_per_sec": config.tokens_per_sec,
+            "rate_limit_rate": config.rate_limit_rate,
+            "overload_rate": config.overload_rate,
+        },
+        "server": server.state.counts,
+        "levels": results,
+    }
+    report_dir = Path(report_dir)
+    report_dir.mkdir(parents=True, exist_ok=True)
+    report_file = report_dir / f"bench_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    log.info("\n🏁 Benchmark results (%d mock requests, %d rate limited, %d overloaded)",
+             report["server"]["requests"], report["server"]["rate_limited"], report["server"]["overloaded"])
+    log.info("  %-11s %8s %10s %8s %8s %8s %8s", "concurrency", "pages", "pages/min",
+             "p50", "p95", "p99", "retries")
+    for row in results:
+        log.info("  %-11d %8d %10.1f %7.2fs %7.2fs %7.2fs %8d", row["concurrency"], row["pages"],
+                 row["pages_per_min"], row["latency"]["p50"], row["latency"]["p95"],
+                 row["latency"]["p99"], row["retries"])
+    log.info("  Report saved to %s", report_file)
+    return report
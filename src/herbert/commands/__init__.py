@@ -1,2 +1,2 @@
 # src/herbert/commands/__init__.py
-from . import extract, ocr
+from . import extract, mock_api, ocr, ocr_bench, ocr_eval, ocr_experiment
@@ -1,6 +1,9 @@
-from herbert.extractor import extract_docx
+from herbert.assets import build_assets
+from herbert.extractor import OUTPUT_DIR, extract_docx
 
 
 def run(args):
     """Run the extract command"""
     extract_docx(args.source_file)  # input docx
+    if args.assets:
+        build_assets(OUTPUT_DIR)
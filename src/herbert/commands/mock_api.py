@@ -0,0 +1,8 @@
+from herbert.mock_api import MockConfig, serve
+
+def run(args):
+    """CLI wrapper for `herbert mock-api`."""
+    config = MockConfig(latency_median=args.latency, latency_sigma=args.jitter, ttft_median=args.ttft,
+                        tokens_per_sec=args.tokens_per_sec, rate_limit_rate=args.rate_limit,
+                        overload_rate=args.overload, transcripts_dir=args.transcripts, seed=args.seed)
+    serve(config, args.host, args.port)
@@ -1,10 +1,26 @@
-from herbert.ocr import run_ocr
+from herbert.models import parse_overrides
+from herbert.ocr import rerun_ocr, run_ocr
 
 def run(args):
     """CLI wrapper for `herbert ocr`."""
     # pass second argument if present
-    if hasattr(args, "label") and args.label:
-        run_ocr(args.source_dir, args.label)
-    else:
-        run_ocr(args.source_dir)
+    label = args.label if hasattr(args, "label") and args.label else ""
 
+    publisher = None
+    if args.html:
+        # imported here so plain OCR runs don't need the extractor's dependencies
+        from herbert.pipeline import PagePublisher
+        publisher = PagePublisher(comments_source=args.comments)
+
+    options = dict(stream=args.stream, cascade=args.cascade, tiles=args.tiles, hint_sheet=args.hint_sheet,
+                   on_page=publisher.publish if publisher else None, concurrency=args.concurrency,
+                   models=parse_overrides(args.model), refresh_models=args.refresh_models,
+                   exact_tokens=args.count_tokens, dedup=args.dedup_bits if args.dedup else None)
+    try:
+        if args.rerun_worst or args.rerun_below is not None:
+            rerun_ocr(args.source_dir, label, worst=args.rerun_worst, cer_threshold=args.rerun_below, **options)
+        else:
+            run_ocr(args.source_dir, label, **options)
+    finally:
+        if publisher:
+            publisher.close()
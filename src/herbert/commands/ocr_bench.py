@@ -0,0 +1,10 @@
+from herbert.bench import run_bench
+from herbert.mock_api import MockConfig
+
+def run(args):
+    """CLI wrapper for `herbert ocr-bench`."""
+    levels = [int(n) for n in args.concurrency.split(",") if n.strip()]
+    config = MockConfig(latency_median=args.latency, latency_sigma=args.jitter, ttft_median=args.ttft,
+                        tokens_per_sec=args.tokens_per_sec, rate_limit_rate=args.rate_limit,
+                        overload_rate=args.overload, transcripts_dir=args.transcripts, seed=args.seed)
+    run_bench(args.source_dir, levels, config, stream=args.stream)
@@ -0,0 +1,5 @@
+from herbert.ocr_eval import run_eval
+
+def run(args):
+    """CLI wrapper for `herbert ocr-eval`."""
+    run_eval(args.ocr_dir, args.ref_dir, args.json, args.hotspots)
@@ -0,0 +1,7 @@
+from herbert.experiment import run_experiment
+
+def run(args):
+    """CLI wrapper for `herbert ocr-experiment`."""
+    families = [m.strip() for m in args.models.split(",") if m.strip()]
+    run_experiment(args.source_dir, args.prompts, args.hints, families, parallel=args.parallel,
+                   concurrency=args.concurrency, rate_limit=args.rate_limit, ref_dir=args.ref_dir)
@@ -0,0 +1,87 @@
+"""
+Split the page comments into small per-page shards for lazy loading.
+
+The single <base>.comments.json holds every page's comments, so the site
+has to fetch all of it to show one page. write_shards() writes alongside it:
+
+    comments/index.json    {"strings": "strings.json", "pages_per_shard": 1,
+                            "pages": {"12": "page012.json", ...}}
+    comments/strings.json  ["comment text", ...]   (each distinct text once)
+    comments/page012.json  {"12": [["c7", 0], ["c9", 3]]}   ([id, string index] pairs)
+
+Only pages that have comments appear in the index, so the site can skip the
+request entirely for the rest. All files are compact (no indentation).
+"""
+import json
+from pathlib import Path
+
+from herbert.log import get_logger
+
+log = get_logger("comment_shards")
+
+PAGES_PER_SHARD = 1
+
+
+def shard_name(page: int, pages_per_shard: int) -> str:
+    """File name of the shard holding `page`."""
+    if pages_per_shard <= 1:
+        return f"page{page:03d}.json"
+    first = (page - 1) // pages_per_shard * pages_per_shard + 1
+    return f"pages{first:03d}-{first + pages_per_shard - 1:03d}.json"
+
+
+def build_shards(metadata: list, pages_per_shard: int = PAGES_PER_SHARD):
+    """
+    Turn [{"page": N, "comments": [{"id", "text"}]}] into
+    (strings, {shard_name: {page: [[id, index], ...]}}, index).
+    """
+    strings = []
+    string_ids = {}
+    shards = {}
+    pages = {}
+    for entry in metadata:
+        if not entry["comments"]:
+            continue
+        page = entry["page"]
+        refs = []
+        for comment in entry["comments"]:
+            text = comment["text"]
+            if text not in string_ids:
+                string_ids[text] = len(strings)
+                strings.append(text)
+            refs.append([comment["id"], string_ids[text]])
+        name = shard_name(page, pages_per_shard) if isinstance(page, int) else f"{page}.json"
+        shards.setdefault(name, {})[str(page)] = refs
+        pages[str(page)] = name
+
+    index = {"strings": "strings.json", "pages_per_shard": pages_per_shard, "pages": pages}
+    return strings, shards, index
+
+
+def _write_compact(path: Path, data) -> int:
+    text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    path.write_text(text, encoding="utf-8")
+    return len(text.encode("utf-8"))
+
+
+def write_shards(metadata: list, shard_dir: Path, pages_per_shard: int = PAGES_PER_SHARD) -> Path:
+    """Write index, string table and per-page shards to shard_dir; returns the index path."""
+    shard_dir = Path(shard_dir)
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    strings, shards, index = build_shards(metadata, pages_per_shard)
+
+    # Shards from an earlier run may no longer exist (comments moved or removed)
+    for stale in shard_dir.glob("page*.json"):
+        if stale.name not in shards:
+            stale.unlink()
+
+    total = _write_compact(shard_dir / "strings.json", strings)
+    for name, data in shards.items():
+        total += _write_compact(shard_dir / name, data)
+    index_path = shard_dir / "index.json"
+    total += _write_compact(index_path, index)
+
+    comment_count = sum(len(e["comments"]) for e in metadata)
+    log.info("Wrote %d comment shards (%d comments, %d distinct texts, %d bytes) to %s/",
+             len(shards), comment_count, len(strings), total, shard_dir)
+    return index_path
@@ -0,0 +1,110 @@
+"""
+Find near-duplicate page scans (rescans, retakes after deskewing) before OCR.
+
+Each page gets a 64-bit difference hash (dHash: brightness gradients on a
+9x8 thumbnail) and a 64-bit perceptual hash (pHash: signs of the low
+frequency DCT coefficients of a 32x32 thumbnail). Two pages are treated as
+the same page when both hashes are within max_distance bits of each other.
+
+data/test_scans has no real retakes. Its five distinct pages are at least
+24 bits apart on the larger of the two distances (the closest pair,
+page001/page129, is 17 apart on dHash alone). Simulated retakes of those
+pages (1 degree rotation, 90% rescale, JPEG quality 60, 10% brighter) stay
+within 10 bits; cropping 2% off every edge moves some pages 12 bits.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from herbert.log import get_logger
+
+log = get_logger("dedup")
+
+# Optional dependencies: only needed for --dedup (pip install herbert[tiles])
+try:
+    import numpy as np
+    from PIL import Image
+except Exception:
+    np = None
+    Image = None
+
+HASH_SIZE = 8
+PHASH_SAMPLE = 32
+DEFAULT_MAX_DISTANCE = 10
+
+
+def _require_imaging():
+    if np is None or Image is None:
+        raise RuntimeError("Duplicate detection needs Pillow and numpy: pip install 'herbert[tiles]'")
+
+
+def _pack(bits) -> int:
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def dhash(gray) -> int:
+    """Difference hash of a grayscale PIL image."""
+    pixels = np.asarray(gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS), dtype=np.float32)
+    return _pack((pixels[:, 1:] > pixels[:, :-1]).flatten())
+
+
+def _dct_matrix(n: int):
+    k = np.arange(n)
+    return np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+
+
+def phash(gray) -> int:
+    """Perceptual hash of a grayscale PIL image (DC term excluded from the median)."""
+    pixels = np.asarray(gray.resize((PHASH_SAMPLE, PHASH_SAMPLE), Image.LANCZOS), dtype=np.float64)
+    dct = _dct_matrix(PHASH_SAMPLE)
+    low = (dct @ pixels @ dct.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    return _pack(low > np.median(low[1:]))
+
+
+def page_hashes(image_path: Path) -> tuple:
+    """(dhash, phash) for one scan."""
+    with Image.open(image_path) as img:
+        gray = img.convert("L")
+    return dhash(gray), phash(gray)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def hash_pages(paths: list, workers: int = None) -> dict:
+    """Hash every scan in parallel; returns {path: (dhash, phash)}."""
+    _require_imaging()
+    # Decoding and resizing happen in Pillow's C code, which releases the GIL
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(page_hashes, paths)))
+
+
+def group_duplicates(paths: list, max_distance: int = DEFAULT_MAX_DISTANCE, workers: int = None) -> list:
+    """
+    Group near-duplicate scans; returns a list of groups in path order.
+
+    Each group is a list of paths whose first entry is the representative
+    to OCR. A page joins the group of the closest earlier representative
+    within max_distance, and is only ever compared with representatives, so
+    pages are never chained together through intermediate scans.
+    """
+    paths = list(paths)
+    hashes = hash_pages(paths, workers)
+    groups = []
+    for path in paths:
+        d, p = hashes[path]
+        best, best_distance = None, None
+        for group in groups:
+            rd, rp = hashes[group[0]]
+            distance = max(hamming(d, rd), hamming(p, rp))
+            if distance <= max_distance and (best is None or distance < best_distance):
+                best, best_distance = group, distance
+        if best is None:
+            groups.append([path])
+        else:
+            log.debug("%s ~ %s (%d bits)", Path(best[0]).name, Path(path).name, best_distance)
+            best.append(path)
+    return groups
@@ -0,0 +1,139 @@
+"""
+Run a matrix of OCR variants (prompt files x hint sets x models) in one go.
+
+Every cell of the matrix is a labelled run_ocr call, so its transcripts land
+in output/ocr_pages as pageNNN_<model>_exp-<prompt>-<hints>.txt next to the
+normal output. Cells run concurrently, each under its own request rate
+limit, and share one result cache, so a cell repeated in a later sweep (or
+any identical request) is not paid for twice. The cells are then scored
+against the manual transcript and compared on accuracy, latency and cost.
+"""
+import itertools
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from herbert.log import get_logger
+from herbert.ocr import run_ocr
+from herbert.ocr_eval import evaluate, summarize_scores
+from herbert.result_cache import ResultCache
+
+log = get_logger("experiment")
+
+NO_HINTS = "none"
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "-", text).strip("-").lower() or "x"
+
+
+def plan_variants(prompts: list, hint_sets: list, families: list) -> list:
+    """One dict per matrix cell with its prompt, hints, family and output label."""
+    variants = []
+    labels = set()
+    for prompt, hints, family in itertools.product(prompts, hint_sets, families):
+        hints_name = "nohints" if hints == NO_HINTS else _slug(Path(hints).name)
+        label = f"exp-{_slug(Path(prompt).stem)}-{hints_name}"
+        # Keep labels unique when two inputs share a name
+        base, n = label, 2
+        while (label, family) in labels:
+            label = f"{base}{n}"
+            n += 1
+        labels.add((label, family))
+        variants.append({"prompt": str(prompt), "hints": str(hints), "family": family, "label": label})
+    return variants
+
+
+def run_experiment(source_dir: str, prompts: list, hint_sets: list, families: list,
+                   parallel: int = 4, concurrency: int = 1, rate_limit: float = None,
+                   ref_dir: str = None, max_tokens: int = 2000) -> list:
+    """
+    Run every variant against source_dir and return one comparison row per variant.
+
+    Args:
+        prompts: Prompt files to compare
+        hint_sets: Hint directories to compare ("none" for no hints)
+        families: Model families to compare
+        parallel: Variants run at the same time
+        concurrency: Pages OCR'd in parallel within each variant
+        rate_limit: Maximum requests per minute for each variant
+        ref_dir: Manual transcript pages to score against (default output/txt)
+    """
+    repo_root = Path(__file__).resolve().parents[2]
+    ref_dir = Path(ref_dir) if ref_dir else repo_root / "output" / "txt"
+    ocr_dir = repo_root / "output" / "ocr_pages"
+    cache = ResultCache(repo_root / "output" / "cache" / "ocr_results")
+    variants = plan_variants(prompts, hint_sets, families)
+    log.info("🧪 Running %d variants (%d prompts x %d hint sets x %d models), %d at a time",
+             len(variants), len(prompts), len(hint_sets), len(families), parallel)
+
+    def run_variant(variant: dict):
+        try:
+            return run_ocr(source_dir, variant["label"], max_tokens=max_tokens, concurrency=concurrency,
+                           prompt_file=variant["prompt"],
+                           hints_dir=None if variant["hints"] == NO_HINTS else variant["hints"],
+                           use_hints=variant["hints"] != NO_HINTS, families=[variant["family"]],
+                           result_cache=cache, rate_limit=rate_limit)
+        except Exception as e:
+            log.error("❌ Variant %s (%s) failed: %s: %s", variant["label"], variant["family"], type(e).__name__, e)
+            return None
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        runs = list(pool.map(run_variant, variants))
+    elapsed = time.time() - started
+
+    scores = evaluate(ocr_dir, ref_dir, hotspots=0)
+    rows = []
+    for variant, metrics in zip(variants, runs):
+        name = f"{variant['family']}_{variant['label']}"
+        # Only pages this sweep produced; older files with the same label are not part of it
+        produced = {r["page"] for r in metrics.requests if r["ok"]} if metrics else set()
+        page_scores = [r for r in scores["pages"] if r["variant"] == name and r["page"] in produced]
+        accuracy = summarize_scores(page_scores).get(name, {})
+        stats = metrics.summary()["families"].get(variant["family"], {}) if metrics else {}
+        rows.append({
+            **variant,
+            "variant": name,
+            "pages_scored": len(page_scores),
+            "cer": accuracy.get("cer"),
+            "wer": accuracy.get("wer"),
+            "latency_p50": stats.get("latency", {}).get("p50"),
+            "latency_p95": stats.get("latency", {}).get("p95"),
+            "input_tokens": stats.get("input_tokens", 0),
+            "output_tokens": stats.get("output_tokens", 0),
+            "cost": stats.get("cost", 0.0),
+            "cached": stats.get("cached", 0),
+            "failed": stats.get("failed", 0) if metrics else None,
+        })
+
+    report_dir = repo_root / "output" / "ocr_reports"
+    report_dir.mkdir(parents=True, exist_ok=True)
+    report_file = report_dir / f"experiment_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump({"source_dir": str(source_dir), "elapsed_sec": elapsed,
+                   "cache_hits": cache.hits, "cache_misses": cache.misses, "variants": rows}, f, indent=2)
+
+    log_table(rows)
+    log.info("  %d variants in %.1fs, %d cached responses reused", len(rows), elapsed, cache.hits)
+    log.info("  Report saved to %s", report_file)
+    return rows
+
+
+def log_table(rows: list) -> None:
+    """Comparison table, most accurate first (unscored variants last)."""
+    def pct(value):
+        return f"{value * 100:6.2f}%" if value is not None else "    n/a"
+
+    def secs(value):
+        return f"{value:6.2f}s" if value is not None else "    n/a"
+
+    log.info("\n📊 Experiment results (cost counts cached responses at their original price):")
+    log.info("  %-34s %-7s %7s %7s %7s %7s %9s %7s %9s %6s", "variant", "model", "CER", "WER",
+             "p50", "p95", "tokens in", "out", "cost", "cached")
+    for row in sorted(rows, key=lambda r: (r["cer"] is None, r["cer"] or 0.0)):
+        log.info("  %-34s %-7s %s %s %s %s %9d %7d %9s %6d", row["label"], row["family"], pct(row["cer"]),
+                 pct(row["wer"]), secs(row["latency_p50"]), secs(row["latency_p95"]),
+                 row["input_tokens"], row["output_tokens"], f"${row['cost']:.4f}", row["cached"])
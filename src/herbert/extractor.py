@@ -1,5 +1,7 @@
 import os
+import html
 import json
+import logging
 import shutil
 import subprocess
 import tempfile
@@ -7,10 +9,16 @@ import re
 import pdfplumber
 import argparse
 import zipfile
+from dataclasses import dataclass, field
 from zipfile import ZipFile
 from lxml import etree
 from lxml.etree import QName
 
+from herbert.comment_shards import write_shards
+from herbert.log import configure_logging, get_logger
+
+log = get_logger("extractor")
+
 # Attempt to import python-docx; if not available, comments fallback may be limited.
 try:
     from docx import Document
@@ -32,12 +40,12 @@ NAMESPACE = {
 OUTPUT_DIR = "output"
 
 
-def convert_to_pdf(source_file: str) -> str:
+def convert_to_pdf(source_file: str, output_dir: str = OUTPUT_DIR) -> str:
     """
     Convert source ODT/DOCX into PDF using LibreOffice headless mode,
-    write to OUTPUT_DIR, and return the PDF path.
+    write to output_dir, and return the PDF path.
     """
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
     with tempfile.TemporaryDirectory() as temp_dir:
         cmd = ["libreoffice", "--headless", "--convert-to", "pdf", "--outdir", temp_dir, source_file]
         result = subprocess.run(cmd, capture_output=True, text=True)
@@ -48,14 +56,14 @@ def convert_to_pdf(source_file: str) -> str:
         out_src = os.path.join(temp_dir, f"{base}.pdf")
         if not os.path.exists(out_src):
             raise Exception(f"Expected PDF not found at {out_src}")
-        out_dst = os.path.join(OUTPUT_DIR, f"{base}.pdf")
+        out_dst = os.path.join(output_dir, f"{base}.pdf")
         shutil.copy2(out_src, out_dst)
         return out_dst
 
 
-def ensure_docx_for_comments(source_file: str) -> str:
-    """Ensure we have a DOCX version of the doc for comment extraction."""
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+def ensure_docx_for_comments(source_file: str, output_dir: str = OUTPUT_DIR) -> str:
+    """Ensure we have a DOCX version of the doc (converted into output_dir) for comment extraction."""
+    os.makedirs(output_dir, exist_ok=True)
     ext = os.path.splitext(source_file)[1].lower()
     if ext == ".docx":
         return source_file
@@ -70,7 +78,7 @@ def ensure_docx_for_comments(source_file: str) -> str:
         out_src = os.path.join(temp_dir, f"{base}.docx")
         if not os.path.exists(out_src):
             raise Exception(f"Expected DOCX not found at {out_src}")
-        out_dst = os.path.join(OUTPUT_DIR, f"{base}.docx")
+        out_dst = os.path.join(output_dir, f"{base}.docx")
         shutil.copy2(out_src, out_dst)
         return out_dst
 
@@ -156,8 +164,7 @@ def extract_comments_simple(docx_file: str) -> dict:
                 }
 
     except Exception as e:
-        print(f"Warning: Could not extract comments: {e}")
-        import traceback; traceback.print_exc()
+        log.warning("Could not extract comments: %s", e, exc_info=log.isEnabledFor(logging.DEBUG))
 
     return {"comments": comments, "comment_data": comment_data}
 
@@ -202,7 +209,10 @@ def _build_anchor_regex(anchor_words):
 
 def _match_and_plan_replacements(page_text, anchors_dict, comments, used_comments):
     r"""
-    Context-based matcher (single-line anchors only):
+    Context-based matcher (single-line anchors only). Returns
+    (spans, page_comments, used_comments) where spans are sorted
+    (start, end, comment_id) character ranges of page_text to link.
+
     - Tokens are \S+; punctuation preserved.
     - Compare using edge-trimmed forms so punctuation hugging words (quotes/commas) doesn't block matches.
     - If both before/after exist, require both; if one side exists, require that one; if neither, anchor-only.
@@ -210,7 +220,7 @@ def _match_and_plan_replacements(page_text, anchors_dict, comments, used_comment
     """
     tokens = _tokenize_with_spans(page_text)
     if not tokens:
-        return page_text, [], used_comments
+        return [], [], used_comments
 
     # Normalized and edge-trimmed tokens
     norm_seq = [t["norm"] for t in tokens]
@@ -275,7 +285,7 @@ def _match_and_plan_replacements(page_text, anchors_dict, comments, used_comment
         n = len(aw_comp)
         punct_only_anchor = (len(aw_norm_list) > 0 and n == 0)
         if n == 0 and not punct_only_anchor:
-            print(f"[debug] skip c{cid}: empty anchor")
+            log.debug("skip c%s: empty anchor", cid)
             continue
 
         def anchor_span_len(start_nonp: int) -> int:
@@ -457,117 +467,217 @@ def _match_and_plan_replacements(page_text, anchors_dict, comments, used_comment
             e -= 2
             raw_anchor_text = page_text[s:e]
 
-        link_html = f'<a class="comment-link" data-comment-id="c{cid}">{raw_anchor_text}</a>'
-        replacements.append((s, e, link_html))
+        replacements.append((s, e, f"c{cid}"))
         page_comments.append({"id": f"c{cid}", "text": comments.get(cid, ""), "anchor": anchor})
         used_comments.add(cid)
 
-    # Apply replacements from end → start
-    if replacements:
-        replacements.sort(key=lambda x: x[0], reverse=True)
-        buf = page_text
-        for s, e, rep in replacements:
-            buf = buf[:s] + rep + buf[e:]
-        page_text = buf
-
-    return page_text, page_comments, used_comments
-
-def extract_docx(source_file: str) -> None:
-    base = os.path.splitext(os.path.basename(source_file))[0]
-    html_dir = os.path.join(OUTPUT_DIR, "html")
-    txt_dir = os.path.join(OUTPUT_DIR, "txt")
-    json_path = os.path.join(OUTPUT_DIR, f"{base}.comments.json")
-    os.makedirs(html_dir, exist_ok=True)
-    os.makedirs(txt_dir, exist_ok=True)
-
-    print("Step 1: Converting to PDF...")
-    pdf_path = convert_to_pdf(source_file)
-
-    print("Step 2: Extracting comments...")
-    docx_for_comments = ensure_docx_for_comments(source_file)
-    comment_data = extract_comments_simple(docx_for_comments)
-    comments = comment_data["comments"]
-    comment_anchors = comment_data["comment_data"]
-    print(f"Found {len(comments)} total comments, {len(comment_anchors)} with context")
-
-    # Debug: list comments that have NO extracted context (e.g., deleted/misaligned ranges)
-    missing_ids = sorted(set(comments.keys()) - set(comment_anchors.keys()), key=lambda x: int(x) if str(x).isdigit() else str(x))
-    if missing_ids:
-        print(f"[debug] {len(missing_ids)} comment(s) with no context:")
-        for mid in missing_ids:
-            txt = (comments.get(mid) or "").strip().replace("\n", " ")
-            if len(txt) > 120:
-                txt = txt[:117] + "..."
-            print(f"  - id=c{mid}: {txt}")
-
-    print("Step 3: Extracting text from PDF pages...")
-    page_texts = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text() or ""
-            page_texts.append(text)
-
-    print(f"Extracted {len(page_texts)} pages from PDF")
-
-    print("Step 4: Processing pages...")
-    metadata = []
-    used_comments = set()
-
-    for page_num in range(len(page_texts)):
-        # Skip cover page if page_num==0 is not part of the journal text
-        if page_num == 0:
-            continue
+    replacements.sort(key=lambda x: x[0])
+    return replacements, page_comments, used_comments
+
+def clean_page_text(page_text: str) -> str:
+    """Drop trailing standalone page number / blank lines from a page's text."""
+    lines = page_text.split('\n')
+    while lines and (lines[-1].strip().isdigit() or not lines[-1].strip()):
+        lines.pop()
+    return '\n'.join(lines)
 
-        html_path = os.path.join(html_dir, f"page{page_num:03d}.html")
-        txt_path = os.path.join(txt_dir, f"page{page_num:03d}.txt")
 
-        page_text = page_texts[page_num]
-        lines = page_text.split('\n')
-        # Drop trailing standalone page number / blank lines
-        while lines and (lines[-1].strip().isdigit() or not lines[-1].strip()):
-            lines.pop()
-        clean_text = '\n'.join(lines)
+def render_page_html(page_text: str, spans: list) -> str:
+    """
+    Render a page as <p data-line='N'> lines with comment links, in one pass.
 
-        # Insert comment links using context (single pass per page; no cross-line anchors)
-        linked_text, page_comments, used_comments = _match_and_plan_replacements(
-            clean_text, comment_anchors, comments, used_comments
-        )
+    spans are sorted, non-overlapping (start, end, comment_id) ranges of
+    page_text to wrap in comment links. Text is HTML-escaped; a link that
+    runs across a line break is closed at the end of the line and reopened
+    on the next so every <p> stays well-formed.
+    """
+    lines = page_text.split("\n")
+    # Drop a stray trailing page-number line
+    if lines and lines[-1].isdigit():
+        lines.pop()
+
+    out = []
+    span_ix = 0
+    pos = 0  # offset of the current line in page_text
+    for line_num, line in enumerate(lines, 1):
+        out.append(f"<p data-line='{line_num}'>")
+        line_end = pos + len(line)
+        cursor = pos
+        while cursor < line_end:
+            while span_ix < len(spans) and spans[span_ix][1] <= cursor:
+                span_ix += 1
+            if span_ix < len(spans) and spans[span_ix][0] < line_end:
+                start, end, comment_id = spans[span_ix]
+                start = max(start, cursor)
+                out.append(html.escape(page_text[cursor:start], quote=False))
+                stop = min(end, line_end)
+                out.append(f'<a class="comment-link" data-comment-id="{comment_id}">')
+                out.append(html.escape(page_text[start:stop], quote=False))
+                out.append("</a>")
+                cursor = stop
+            else:
+                out.append(html.escape(page_text[cursor:line_end], quote=False))
+                cursor = line_end
+        out.append("</p>\n")
+        pos = line_end + 1  # skip the newline
+
+    return "".join(out).rstrip("\n")
+
+
+def process_page(page_text: str, comment_anchors: dict, comments: dict, used_comments: set):
+    """
+    Clean one page, link its comment anchors and render it as HTML.
 
-        metadata.append({
-            "page": page_num,
-            "comments": [{"id": c["id"], "text": c["text"]} for c in page_comments]
-        })
+    Comments matched on this page are added to used_comments so they are
+    not anchored again on a later page.
+    Returns (clean_text, html_content, page_comments).
+    """
+    clean_text = clean_page_text(page_text)
 
-        # Wrap each extracted line in <p data-line='N'> ... </p>
-        html_lines = []
-        for line_num, line in enumerate(linked_text.split('\n'), 1):
-            html_lines.append(f"<p data-line='{line_num}'>{line}</p>")
-        html_content = '\n'.join(html_lines)
+    # Find comment anchors, then render text and links in a single pass
+    spans, page_comments, used_comments = _match_and_plan_replacements(
+        clean_text, comment_anchors, comments, used_comments
+    )
+    return clean_text, render_page_html(clean_text, spans), page_comments
 
-        # Remove stray trailing numeric paragraph if any
-        html_content = re.sub(r"<p data-line='\d+'>\d+</p>\s*$", "", html_content)
 
-        with open(html_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
-        with open(txt_path, "w", encoding="utf-8") as f:
-            f.write(clean_text)
+def _comment_sort_key(cid):
+    return int(cid) if str(cid).isdigit() else str(cid)
 
-    # End-of-run summary for comments that had context but never anchored anywhere
-    remaining = sorted(set(comment_anchors.keys()) - set(used_comments), key=lambda x: int(x) if str(x).isdigit() else str(x))
-    if remaining:
-        print(f"[debug] {len(remaining)} comment(s) with context not anchored:")
-        for cid in remaining:
-            ctx = comment_anchors.get(cid, {})
-            anchor = ctx.get("anchor", "").strip()
-            bw = ctx.get("before_words", "").strip()
-            fw = ctx.get("after_words", "").strip()
-            print(f"  - id=c{cid}: anchor='{anchor}' before='{bw}' after='{fw}'")
 
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
+@dataclass
+class PageResult:
+    """One processed journal page."""
+    page: int
+    text: str
+    html: str
+    comments: list
 
-    print(f"PDF saved as: {pdf_path}")
-    print(f"\u2713 Extracted {len(page_texts) - 1} pages to {OUTPUT_DIR}/")
+    def metadata(self) -> dict:
+        """The page's entry in <base>.comments.json."""
+        return {"page": self.page, "comments": [{"id": c["id"], "text": c["text"]} for c in self.comments]}
+
+
+@dataclass
+class CommentReport:
+    """How the document's comments were matched to pages."""
+    total: int = 0
+    with_context: int = 0
+    no_context: list = field(default_factory=list)   # ids with no anchor range in the document
+    unanchored: list = field(default_factory=list)   # ids with context that matched no page
+    anchored: int = 0
+
+
+class JournalExtractor:
+    """
+    In-memory extraction of a journal document.
+
+    pages() converts the document, matches comments and yields a PageResult
+    per page without writing any page files; report is complete once the
+    iteration finishes. Intermediate PDF/DOCX conversions go to work_dir,
+    or to a temporary directory that is removed afterwards.
+    """
+
+    def __init__(self, source_file: str, work_dir: str = None):
+        self.source_file = source_file
+        self.work_dir = work_dir
+        self.base = os.path.splitext(os.path.basename(source_file))[0]
+        self.report = CommentReport()
+        self.pdf_path = None
+
+    def pages(self):
+        if self.work_dir is not None:
+            yield from self._pages(self.work_dir)
+            return
+        with tempfile.TemporaryDirectory() as work_dir:
+            yield from self._pages(work_dir)
+
+    def _pages(self, work_dir: str):
+        log.info("Step 1: Converting to PDF...")
+        self.pdf_path = convert_to_pdf(self.source_file, work_dir)
+
+        log.info("Step 2: Extracting comments...")
+        comment_data = extract_comments_simple(ensure_docx_for_comments(self.source_file, work_dir))
+        comments = comment_data["comments"]
+        comment_anchors = comment_data["comment_data"]
+        report = self.report
+        report.total = len(comments)
+        report.with_context = len(comment_anchors)
+        report.no_context = sorted(set(comments) - set(comment_anchors), key=_comment_sort_key)
+        log.info("Found %d total comments, %d with context", len(comments), len(comment_anchors))
+
+        # Debug: list comments that have NO extracted context (e.g., deleted/misaligned ranges)
+        if report.no_context and log.isEnabledFor(logging.DEBUG):
+            log.debug("%d comment(s) with no context:", len(report.no_context))
+            for mid in report.no_context:
+                txt = (comments.get(mid) or "").strip().replace("\n", " ")
+                if len(txt) > 120:
+                    txt = txt[:117] + "..."
+                log.debug("  - id=c%s: %s", mid, txt)
+
+        log.info("Step 3: Extracting and processing PDF pages...")
+        used_comments = set()
+        with pdfplumber.open(self.pdf_path) as pdf:
+            for page_num, page in enumerate(pdf.pages):
+                # Skip cover page if page_num==0 is not part of the journal text
+                if page_num == 0:
+                    continue
+                clean_text, html_content, page_comments = process_page(
+                    page.extract_text() or "", comment_anchors, comments, used_comments
+                )
+                yield PageResult(page_num, clean_text, html_content, page_comments)
+
+        report.anchored = len(used_comments)
+        report.unanchored = sorted(set(comment_anchors) - used_comments, key=_comment_sort_key)
+        # End-of-run summary for comments that had context but never anchored anywhere
+        if report.unanchored:
+            log.info("%d comment(s) with context not anchored", len(report.unanchored))
+            if log.isEnabledFor(logging.DEBUG):
+                for cid in report.unanchored:
+                    ctx = comment_anchors.get(cid, {})
+                    anchor = ctx.get("anchor", "").strip()
+                    bw = ctx.get("before_words", "").strip()
+                    fw = ctx.get("after_words", "").strip()
+                    log.debug("  - id=c%s: anchor='%s' before='%s' after='%s'", cid, anchor, bw, fw)
+
+
+class DiskWriter:
+    """Sink that writes PageResults as html/txt page files plus the comments JSON and shards."""
+
+    def __init__(self, output_dir: str, base: str):
+        self.output_dir = output_dir
+        self.base = base
+        self.html_dir = os.path.join(output_dir, "html")
+        self.txt_dir = os.path.join(output_dir, "txt")
+        os.makedirs(self.html_dir, exist_ok=True)
+        os.makedirs(self.txt_dir, exist_ok=True)
+        self.metadata = []
+
+    def write(self, result: PageResult) -> None:
+        with open(os.path.join(self.html_dir, f"page{result.page:03d}.html"), "w", encoding="utf-8") as f:
+            f.write(result.html)
+        with open(os.path.join(self.txt_dir, f"page{result.page:03d}.txt"), "w", encoding="utf-8") as f:
+            f.write(result.text)
+        self.metadata.append(result.metadata())
+
+    def close(self) -> None:
+        json_path = os.path.join(self.output_dir, f"{self.base}.comments.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(self.metadata, f, indent=2)
+        write_shards(self.metadata, os.path.join(self.output_dir, "comments"))
+
+
+def extract_docx(source_file: str, output_dir: str = OUTPUT_DIR) -> CommentReport:
+    """Extract a journal document into page files under output_dir; returns the comment report."""
+    extractor = JournalExtractor(source_file, work_dir=output_dir)
+    writer = DiskWriter(output_dir, extractor.base)
+    for result in extractor.pages():
+        writer.write(result)
+    writer.close()
+
+    log.info("PDF saved as: %s", extractor.pdf_path)
+    log.info("\u2713 Extracted %d pages to %s/", len(writer.metadata), output_dir)
+    return extractor.report
 
 
 if __name__ == "__main__":
@@ -575,5 +685,6 @@ if __name__ == "__main__":
     parser.add_argument("source", help="Path to source ODT/DOCX file")
     args = parser.parse_args()
 
+    configure_logging()
     extract_docx(args.source)
 
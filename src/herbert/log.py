@@ -0,0 +1,94 @@
+"""
+Logging setup shared by the herbert commands.
+
+Modules get a child of the "herbert" logger via get_logger() and log with
+%-style arguments so messages are only formatted when their level is
+enabled. Expensive diagnostics should additionally be wrapped in
+`if log.isEnabledFor(logging.DEBUG):`.
+"""
+import json
+import logging
+import sys
+import time
+
+ROOT_LOGGER = "herbert"
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return a logger under the herbert namespace (e.g. herbert.ocr)."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Plain messages for INFO, prefixed markers for debug and problems."""
+
+    PREFIXES = {
+        logging.DEBUG: "🔍 DEBUG: ",
+        logging.WARNING: "⚠️ ",
+        logging.ERROR: "❌ ",
+        logging.CRITICAL: "❌ ",
+    }
+
+    def format(self, record):
+        message = record.getMessage()
+        prefix = self.PREFIXES.get(record.levelno, "")
+        # Messages that already carry their own emoji marker keep it
+        if prefix and record.levelno >= logging.WARNING and message.startswith(("⚠️", "❌")):
+            prefix = ""
+        text = f"{prefix}{message}"
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for machine-readable run logs."""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+                    + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def verbosity_to_level(verbosity: int) -> int:
+    """Map -q/-v counts to a logging level (0 = INFO)."""
+    if verbosity >= 1:
+        return logging.DEBUG
+    if verbosity == -1:
+        return logging.WARNING
+    if verbosity <= -2:
+        return logging.ERROR
+    return logging.INFO
+
+
+def configure_logging(verbosity: int = 0, json_file: str = None) -> None:
+    """
+    Configure the herbert logger.
+
+    Args:
+        verbosity: -v count minus -q count (0 = INFO, 1+ = DEBUG, -1 = WARNING, -2 = ERROR)
+        json_file: Optional path of a JSON-lines log sink (written at the same level)
+    """
+    level = verbosity_to_level(verbosity)
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(level)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(ConsoleFormatter())
+    logger.addHandler(console)
+
+    if json_file:
+        sink = logging.FileHandler(json_file, encoding="utf-8")
+        sink.setFormatter(JsonFormatter())
+        logger.addHandler(sink)
@@ -0,0 +1,215 @@
+"""
+Per-request OCR metrics and the end-of-run report.
+
+Each API request made by run_ocr is recorded with its latency, token usage,
+payload size, stop reason and retry count. At the end of the run the
+records are reduced to per-model-family percentiles, throughput and an
+estimated cost, written as JSON and logged as a short human summary.
+"""
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+from herbert.log import get_logger
+
+log = get_logger("metrics")
+
+DEFAULT_API_URL = "https://api.anthropic.com"
+
+# Published list prices in USD per million tokens: (input, output)
+MODEL_PRICING = {
+    "haiku":  (0.80, 4.00),
+    "sonnet": (3.00, 15.00),
+    "opus":   (15.00, 75.00),
+}
+# Prompt caching is billed relative to the base input price
+CACHE_WRITE_MULTIPLIER = 1.25
+CACHE_READ_MULTIPLIER = 0.10
+
+REPORT_DIR = Path("output") / "ocr_reports"
+
+
+def percentile(values: list, pct: float) -> float:
+    """Linear-interpolated percentile (pct in 0-100) of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return float(ordered[0])
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    if lower == upper:
+        return float(ordered[lower])
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def estimate_cost(family: str, input_tokens: int, output_tokens: int,
+                  cache_creation_tokens: int = 0, cache_read_tokens: int = 0) -> float:
+    """Estimated USD cost of a request for a model family (0.0 if unpriced)."""
+    if family not in MODEL_PRICING:
+        return 0.0
+    input_price, output_price = MODEL_PRICING[family]
+    cost = (input_tokens * input_price
+            + cache_creation_tokens * input_price * CACHE_WRITE_MULTIPLIER
+            + cache_read_tokens * input_price * CACHE_READ_MULTIPLIER
+            + output_tokens * output_price)
+    return cost / 1_000_000
+
+
+def usage_fields(usage) -> dict:
+    """Flatten an API usage object into plain token counts."""
+    return {
+        "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+    }
+
+
+def _distribution(values: list) -> dict:
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+class RunMetrics:
+    """Thread-safe collector for the requests made during one OCR run."""
+
+    def __init__(self, label: str = "", model_ids: dict = None):
+        self.label = label
+        self.model_ids = dict(model_ids or {})
+        # Where the requests went, so reports from the mock API are never mistaken for real ones
+        self.api_base_url = os.environ.get("ANTHROPIC_BASE_URL") or DEFAULT_API_URL
+        self.started = time.time()
+        self.finished = None
+        self.requests = []
+        self.sections = {}
+        self._lock = threading.Lock()
+
+    def record(self, page: str, family: str, model: str, latency: float, usage=None,
+               request_bytes: int = 0, stop_reason: str = None, retries: int = 0,
+               ok: bool = True, error: str = None, **extra) -> dict:
+        """Record one request. Extra keyword fields (e.g. ttft) are kept as-is."""
+        entry = {
+            "page": page,
+            "family": family,
+            "model": model,
+            "latency": latency,
+            "request_bytes": request_bytes,
+            "stop_reason": stop_reason,
+            "retries": retries,
+            "ok": ok,
+            "error": error,
+        }
+        entry.update(usage_fields(usage))
+        entry["cost"] = estimate_cost(family, entry["input_tokens"], entry["output_tokens"],
+                                      entry["cache_creation_input_tokens"], entry["cache_read_input_tokens"])
+        entry.update(extra)
+        with self._lock:
+            self.requests.append(entry)
+        return entry
+
+    def add_section(self, name: str, data: dict) -> None:
+        """Attach a mode-specific section (e.g. cascade stats) to the report."""
+        with self._lock:
+            self.sections[name] = data
+
+    def finish(self) -> None:
+        self.finished = time.time()
+
+    def summary(self) -> dict:
+        """Per-family and overall aggregates of the recorded requests."""
+        with self._lock:
+            requests = list(self.requests)
+        elapsed = (self.finished or time.time()) - self.started
+        minutes = elapsed / 60 if elapsed > 0 else 0
+
+        families = {}
+        for family in sorted({r["family"] for r in requests}):
+            rows = [r for r in requests if r["family"] == family]
+            ok_rows = [r for r in rows if r["ok"]]
+            stats = {
+                "model": self.model_ids.get(family) or (rows[0]["model"] if rows else None),
+                "requests": len(rows),
+                "failed": len(rows) - len(ok_rows),
+                "retries": sum(r["retries"] for r in rows),
+                "cached": sum(1 for r in rows if r.get("cached")),
+                "latency": _distribution([r["latency"] for r in ok_rows]),
+                "input_tokens": sum(r["input_tokens"] for r in rows),
+                "output_tokens": sum(r["output_tokens"] for r in rows),
+                "cache_creation_input_tokens": sum(r["cache_creation_input_tokens"] for r in rows),
+                "cache_read_input_tokens": sum(r["cache_read_input_tokens"] for r in rows),
+                "request_bytes": sum(r["request_bytes"] for r in rows),
+                "stop_reasons": {},
+                "cost": sum(r["cost"] for r in rows),
+                "pages_per_min": len({r["page"] for r in ok_rows}) / minutes if minutes else 0.0,
+            }
+            for r in rows:
+                key = r["stop_reason"] or ("error" if not r["ok"] else "unknown")
+                stats["stop_reasons"][key] = stats["stop_reasons"].get(key, 0) + 1
+            ttfts = [r["ttft"] for r in ok_rows if r.get("ttft") is not None]
+            if ttfts:
+                stats["ttft"] = _distribution(ttfts)
+                rates = [r["tokens_per_sec"] for r in ok_rows if r.get("tokens_per_sec")]
+                stats["tokens_per_sec"] = sum(rates) / len(rates) if rates else 0.0
+            agreement = [r["cer_vs_full_page"] for r in ok_rows if r.get("cer_vs_full_page") is not None]
+            if agreement:
+                stats["cer_vs_full_page"] = sum(agreement) / len(agreement)
+            families[family] = stats
+
+        pages_done = {r["page"] for r in requests if r["ok"]}
+        return {
+            "label": self.label,
+            "api_base_url": self.api_base_url,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "elapsed_sec": elapsed,
+            "pages": len(pages_done),
+            "requests": len(requests),
+            "pages_per_min": len(pages_done) / minutes if minutes else 0.0,
+            "cost": sum(f["cost"] for f in families.values()),
+            "families": families,
+        }
+
+    def write_report(self, report_dir: Path = REPORT_DIR, tag: str = "") -> Path:
+        """Write summary plus raw request records as JSON; returns the report path."""
+        report_dir = Path(report_dir)
+        report_dir.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+        suffix = "".join(f"_{part}" for part in (self.label, tag) if part)
+        report_file = report_dir / f"run_{stamp}{suffix}.json"
+        with self._lock:
+            requests = list(self.requests)
+        with open(report_file, "w", encoding="utf-8") as f:
+            json.dump({"summary": self.summary(), **self.sections, "requests": requests}, f, indent=2)
+        return report_file
+
+    def log_summary(self) -> None:
+        """Human-readable end-of-run summary."""
+        summary = self.summary()
+        log.info("\n📊 OCR run summary: %d pages, %d requests in %.1fs (%.1f pages/min), est. $%.4f",
+                 summary["pages"], summary["requests"], summary["elapsed_sec"],
+                 summary["pages_per_min"], summary["cost"])
+        for family, stats in summary["families"].items():
+            latency = stats["latency"]
+            log.info("  %s (%s): %d requests, %d failed, %d retries%s",
+                     family, stats["model"], stats["requests"], stats["failed"], stats["retries"],
+                     f", {stats['cached']} from cache" if stats["cached"] else "")
+            log.info("    latency p50 %.2fs  p95 %.2fs  p99 %.2fs",
+                     latency["p50"], latency["p95"], latency["p99"])
+            if "ttft" in stats:
+                log.info("    first token p50 %.2fs  p95 %.2fs, %.1f tokens/s",
+                         stats["ttft"]["p50"], stats["ttft"]["p95"], stats["tokens_per_sec"])
+            log.info("    tokens in %d (cache write %d, read %d) / out %d, %.2f MB sent, est. $%.4f",
+                     stats["input_tokens"], stats["cache_creation_input_tokens"],
+                     stats["cache_read_input_tokens"], stats["output_tokens"],
+                     stats["request_bytes"] / 1024 / 1024, stats["cost"])
+            if "cer_vs_full_page" in stats:
+                log.info("    tiled vs full-page transcript: %.2f%% CER", stats["cer_vs_full_page"] * 100)
+            log.info("    stop reasons: %s", stats["stop_reasons"])
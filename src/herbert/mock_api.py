@@ -0,0 +1,368 @@
+"""
+Local stand-in for the parts of the Anthropic API that herbert uses.
+
+Implements models.list, messages.create (plain and streaming SSE),
+messages.count_tokens and the message batches endpoints, with configurable
+latency, streaming speed, rate-limit/overload injection and canned
+transcripts. Point the SDK at it with ANTHROPIC_BASE_URL to exercise
+run_ocr without an API key or cost.
+"""
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from herbert.log import get_logger
+from herbert.planner import estimate_content_tokens
+
+log = get_logger("mock_api")
+
+MOCK_MODELS = [
+    "claude-sonnet-4-20250514",
+    "claude-opus-4-1-20250805",
+    "claude-3-5-haiku-20241022",
+]
+
+DEFAULT_TRANSCRIPT = (
+    "Monday 3rd. Fine day, wind light from the West.\n"
+    "Went ashore after breakfast with Mr. Crew's party\n"
+    "and walked as far as the Pightle, returning by\n"
+    "the quay in time for dinner. Repainted the table\n"
+    "cloth locker in the afternoon, etc.\n"
+)
+
+
+class MockConfig:
+    """Behaviour knobs for the mock server."""
+
+    def __init__(self, latency_median: float = 2.0, latency_sigma: float = 0.5,
+                 ttft_median: float = 0.8, tokens_per_sec: float = 60.0,
+                 rate_limit_rate: float = 0.0, overload_rate: float = 0.0,
+                 transcripts_dir: str = None, batch_seconds: float = 5.0, seed: int = None):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.ttft_median = ttft_median
+        self.tokens_per_sec = tokens_per_sec
+        self.rate_limit_rate = rate_limit_rate
+        self.overload_rate = overload_rate
+        self.batch_seconds = batch_seconds
+        self.random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.transcripts = []
+        if transcripts_dir:
+            self.transcripts = [p.read_text(encoding="utf-8")
+                                for p in sorted(Path(transcripts_dir).glob("*.txt"))]
+            log.info("Mock API loaded %d canned transcripts from %s", len(self.transcripts), transcripts_dir)
+
+    def sample(self, median: float) -> float:
+        """Log-normal delay around a median, so the tail looks like a real API."""
+        if median <= 0:
+            return 0.0
+        with self._random_lock:
+            return self.random.lognormvariate(0.0, self.latency_sigma) * median
+
+    def roll(self, rate: float) -> bool:
+        with self._random_lock:
+            return self.random.random() < rate
+
+    def transcript_for(self, content: list) -> str:
+        """Pick a canned transcript deterministically from the page image."""
+        if not self.transcripts:
+            return DEFAULT_TRANSCRIPT
+        images = [b for b in content if isinstance(b, dict) and b.get("type") == "image"]
+        key = images[-1]["source"].get("data", "") if images else json.dumps(content)
+        index = int(hashlib.sha1(key.encode("utf-8")).hexdigest(), 16) % len(self.transcripts)
+        return self.transcripts[index]
+
+
+def count_input_tokens(messages: list, system=None) -> int:
+    """Rough input token count using the planner's local estimate."""
+    tokens = len(system) // 4 if isinstance(system, str) else 0
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        tokens += estimate_content_tokens(content)
+    return max(tokens, 1)
+
+
+def _output_for(config: MockConfig, body: dict):
+    """(text, stop_reason, output_tokens) for a messages request."""
+    content = body["messages"][-1].get("content", []) if body.get("messages") else []
+    text = config.transcript_for(content if isinstance(content, list) else [])
+    output_tokens = max(len(text) // 4, 1)
+    max_tokens = int(body.get("max_tokens", 1024))
+    if output_tokens > max_tokens:
+        text = text[:max_tokens * 4]
+        return text, "max_tokens", max_tokens
+    return text, "end_turn", output_tokens
+
+
+def _message(body: dict, text: str, stop_reason: str, output_tokens: int) -> dict:
+    return {
+        "id": f"msg_mock_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", MOCK_MODELS[0]),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": stop_reason,
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": count_input_tokens(body.get("messages", []), body.get("system")),
+            "output_tokens": output_tokens,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        },
+    }
+
+
+class MockState:
+    """Batches and counters shared by all handler threads."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.batches = {}
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "rate_limited": 0, "overloaded": 0}
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.counts[key] += 1
+
+
+def _timestamp(t: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(t))
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server_version = "herbert-mock-api/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    def log_message(self, fmt, *args):
+        log.debug("mock %s - %s", self.address_string(), fmt % args)
+
+    # -- helpers -----------------------------------------------------------
+
+    def _send_json(self, status: int, payload, headers: dict = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("request-id", f"req_mock_{uuid.uuid4().hex[:16]}")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, error_type: str, message: str, headers: dict = None):
+        self._send_json(status, {"type": "error", "error": {"type": error_type, "message": message}}, headers)
+
+    def _read_body(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw or b"{}")
+
+    def _inject_failure(self) -> bool:
+        """Maybe answer with a 429/529 instead of serving the request."""
+        config = self.state.config
+        if config.roll(config.rate_limit_rate):
+            self.state.count("rate_limited")
+            self._error(429, "rate_limit_error", "Mock rate limit exceeded",
+                        {"retry-after": "1", "retry-after-ms": "250"})
+            return True
+        if config.roll(config.overload_rate):
+            self.state.count("overloaded")
+            self._error(529, "overloaded_error", "Mock API is overloaded")
+            return True
+        return False
+
+    # -- routes ------------------------------------------------------------
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path == "/v1/models":
+            data = [{"type": "model", "id": m, "display_name": m, "created_at": "2025-01-01T00:00:00Z"}
+                    for m in MOCK_MODELS]
+            return self._send_json(200, {"data": data, "has_more": False,
+                                         "first_id": data[0]["id"], "last_id": data[-1]["id"]})
+
+        match = re.fullmatch(r"/v1/messages/batches/([\w-]+)(/results)?", path)
+        if match:
+            with self.state.lock:
+                batch = self.state.batches.get(match.group(1))
+            if batch is None:
+                return self._error(404, "not_found_error", f"Batch {match.group(1)} not found")
+            if match.group(2):
+                return self._batch_results(batch)
+            return self._send_json(200, self._batch_view(batch))
+
+        self._error(404, "not_found_error", f"No mock route for GET {path}")
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        try:
+            body = self._read_body()
+        except ValueError:
+            return self._error(400, "invalid_request_error", "Request body is not valid JSON")
+
+        if path == "/v1/messages/count_tokens":
+            return self._send_json(200, {"input_tokens": count_input_tokens(body.get("messages", []),
+                                                                            body.get("system"))})
+        if path == "/v1/messages/batches":
+            return self._create_batch(body)
+        if path == "/v1/messages":
+            self.state.count("requests")
+            if self._inject_failure():
+                return None
+            if body.get("stream"):
+                return self._stream_message(body)
+            return self._create_message(body)
+
+        self._error(404, "not_found_error", f"No mock route for POST {path}")
+
+    def _create_message(self, body: dict):
+        config = self.state.config
+        time.sleep(config.sample(config.latency_median))
+        text, stop_reason, output_tokens = _output_for(config, body)
+        self._send_json(200, _message(body, text, stop_reason, output_tokens))
+
+    def _stream_message(self, body: dict):
+        config = self.state.config
+        text, stop_reason, output_tokens = _output_for(config, body)
+        message = _message(body, "", None, 1)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(name: str, data: dict):
+            self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        time.sleep(config.sample(config.ttft_median))
+        event("message_start", {"type": "message_start", "message": message})
+        event("content_block_start", {"type": "content_block_start", "index": 0,
+                                      "content_block": {"type": "text", "text": ""}})
+        # ~4 characters per token, delivered at the configured generation speed
+        chunk_chars = 16
+        delay = (chunk_chars / 4) / config.tokens_per_sec if config.tokens_per_sec > 0 else 0
+        for start in range(0, len(text), chunk_chars):
+            event("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                          "delta": {"type": "text_delta", "text": text[start:start + chunk_chars]}})
+            time.sleep(delay)
+        event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        event("message_delta", {"type": "message_delta",
+                                "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                                "usage": {"output_tokens": output_tokens}})
+        event("message_stop", {"type": "message_stop"})
+
+    # -- batches -----------------------------------------------------------
+
+    def _create_batch(self, body: dict):
+        requests = body.get("requests", [])
+        if not requests:
+            return self._error(400, "invalid_request_error", "requests: at least one request is required")
+        now = time.time()
+        batch = {
+            "id": f"msgbatch_mock_{uuid.uuid4().hex[:20]}",
+            "created": now,
+            "ends": now + self.state.config.batch_seconds,
+            "requests": requests,
+            "results": None,
+        }
+        with self.state.lock:
+            self.state.batches[batch["id"]] = batch
+        self._send_json(200, self._batch_view(batch))
+
+    def _batch_view(self, batch: dict) -> dict:
+        ended = time.time() >= batch["ends"]
+        total = len(batch["requests"])
+        base = f"http://{self.headers.get('Host', 'localhost')}"
+        return {
+            "id": batch["id"],
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else total,
+                "succeeded": total if ended else 0,
+                "errored": 0, "canceled": 0, "expired": 0,
+            },
+            "created_at": _timestamp(batch["created"]),
+            "expires_at": _timestamp(batch["created"] + 24 * 3600),
+            "ended_at": _timestamp(batch["ends"]) if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{base}/v1/messages/batches/{batch['id']}/results" if ended else None,
+        }
+
+    def _batch_results(self, batch: dict):
+        if time.time() < batch["ends"]:
+            return self._error(400, "invalid_request_error", "Batch is still in progress")
+        lines = []
+        for request in batch["requests"]:
+            params = request.get("params", {})
+            text, stop_reason, output_tokens = _output_for(self.state.config, params)
+            lines.append(json.dumps({
+                "custom_id": request.get("custom_id"),
+                "result": {"type": "succeeded", "message": _message(params, text, stop_reason, output_tokens)},
+            }))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/binary")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockServer(ThreadingHTTPServer):
+    """Threaded server that shrugs off clients hanging up mid-connection."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple, config: MockConfig):
+        super().__init__(address, MockHandler)
+        self.state = MockState(config)
+
+    def handle_error(self, request, client_address):
+        # The SDK drops keep-alive connections after injected 429/529 errors
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            log.debug("Client %s:%d disconnected", *client_address[:2])
+            return
+        super().handle_error(request, client_address)
+
+
+def start_server(config: MockConfig, host: str = "127.0.0.1", port: int = 0):
+    """Start the mock API in a background thread; returns (server, base_url)."""
+    server = MockServer((host, port), config)
+    thread = threading.Thread(target=server.serve_forever, name="mock-api", daemon=True)
+    thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    log.debug("Mock API listening on %s", base_url)
+    return server, base_url
+
+
+def serve(config: MockConfig, host: str = "127.0.0.1", port: int = 8765) -> None:
+    """Run the mock API in the foreground until interrupted."""
+    server = MockServer((host, port), config)
+    log.info("🧪 Mock Anthropic API on http://%s:%d", host, server.server_address[1])
+    log.info("   export ANTHROPIC_BASE_URL=http://%s:%d ANTHROPIC_API_KEY=mock", host, server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        log.info("Mock API stopped after %s", server.state.counts)
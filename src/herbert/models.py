@@ -0,0 +1,121 @@
+"""
+Model registry: which model ID to use for each family.
+
+The model list from the API is cached on disk (per API base URL) for
+MODEL_CACHE_TTL, so most runs start without a models.list() round trip.
+Families can be pinned to an explicit ID, which also skips the lookup when
+every family in use is pinned.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from herbert.log import get_logger
+
+log = get_logger("models")
+
+MODEL_CACHE = Path("output") / "cache" / "models.json"
+MODEL_CACHE_TTL = 24 * 3600
+
+# Used when the API can't be reached and nothing is cached
+FALLBACK_MODEL_IDS = {
+    "sonnet": "claude-sonnet-4-20250514",
+    "haiku":  "claude-3-5-haiku-20241022",
+    "opus":   "claude-opus-4-1-20250805",
+}
+
+
+def parse_overrides(values: list) -> dict:
+    """Turn ["sonnet=claude-...", ...] into {"sonnet": "claude-..."}."""
+    overrides = {}
+    for value in values or []:
+        family, sep, model_id = value.partition("=")
+        if not sep or not family.strip() or not model_id.strip():
+            raise ValueError(f"Model override must look like family=model-id, got '{value}'")
+        overrides[family.strip().lower()] = model_id.strip()
+    return overrides
+
+
+def pick_latest(available_models: list, families: list) -> dict:
+    """First (newest) model ID containing each family name."""
+    model_ids = {}
+    for family in families:
+        for model_id in available_models:
+            if family in model_id.lower():
+                model_ids[family] = model_id
+                break
+        else:
+            log.debug("No %s model found", family.capitalize())
+    return model_ids
+
+
+def _base_url() -> str:
+    return os.environ.get("ANTHROPIC_BASE_URL") or "https://api.anthropic.com"
+
+
+def load_cache(cache_file: Path) -> dict:
+    try:
+        return json.loads(Path(cache_file).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache_file: Path, models: list) -> None:
+    cache_file = Path(cache_file)
+    cache = load_cache(cache_file)
+    cache[_base_url()] = {"fetched": time.time(), "models": models}
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    # Unique per thread: concurrent runs (ocr-experiment) may refresh the cache at once
+    tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_file.write_text(json.dumps(cache, indent=2), encoding="utf-8")
+    tmp_file.replace(cache_file)
+
+
+def resolve_model_ids(client, families: list, overrides: dict = None, refresh: bool = False,
+                      cache_file: Path = MODEL_CACHE, ttl: float = MODEL_CACHE_TTL) -> dict:
+    """
+    Map each family to a model ID.
+
+    Pinned overrides win; otherwise the cached model list is used while it
+    is younger than ttl, then the API, then a stale cache, then
+    FALLBACK_MODEL_IDS.
+    """
+    overrides = dict(overrides or {})
+    if families and all(f in overrides for f in families):
+        log.info("📌 Using pinned model IDs: %s", overrides)
+        return overrides
+
+    entry = load_cache(cache_file).get(_base_url())
+    age = time.time() - entry["fetched"] if entry else None
+    source = None
+    if entry and not refresh and age < ttl:
+        available_models = entry["models"]
+        source = f"cache ({age / 3600:.1f}h old)"
+    else:
+        try:
+            log.debug("Making API call to client.models.list()...")
+            start_time = time.time()
+            available_models = [model.id for model in client.models.list().data]
+            log.debug("API call completed in %.2fs, %d models: %s",
+                      time.time() - start_time, len(available_models), available_models)
+            save_cache(cache_file, available_models)
+            source = "API"
+        except Exception as e:
+            log.warning("⚠️ Failed to fetch latest models from API: %s: %s", type(e).__name__, e)
+            if entry:
+                available_models = entry["models"]
+                source = f"stale cache ({age / 3600:.1f}h old)"
+            else:
+                log.info("📄 Falling back to hardcoded model IDs...")
+                model_ids = dict(FALLBACK_MODEL_IDS)
+                model_ids.update(overrides)
+                return model_ids
+
+    model_ids = pick_latest(available_models, families)
+    model_ids.update(overrides)
+    log.info("🔡 Model IDs from %s:", source)
+    for family, model_id in model_ids.items():
+        log.info("  %s: %s%s", family, model_id, " (pinned)" if family in overrides else "")
+    return model_ids
@@ -1,10 +1,28 @@
 import os
 import base64
+import hashlib
+import logging
 import re
 from pathlib import Path
-import anthropic
 import json
+import shutil
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from herbert.client import RateLimiter, get_client
+from herbert.dedup import group_duplicates
+from herbert.hint_sheet import load_sheet
+from herbert.log import get_logger
+from herbert.metrics import RunMetrics, estimate_cost, usage_fields
+from herbert.models import MODEL_CACHE, resolve_model_ids
+from herbert.ocr_eval import EVAL_FILE, REF_DIR, load_scores, score_page, select_reruns, update_scores
+from herbert.planner import OutputHistory, count_input_tokens, fit_hints, next_budget, payload_bytes
+from herbert.result_cache import ResultCache
+from herbert.tiles import split_page, stitch_transcripts
+
+log = get_logger("ocr")
 
 
 # Array of model families to process
@@ -12,179 +30,178 @@ import time
 # After manual testing, I removed Haiku
 MODEL_FAMILIES = ["sonnet", "opus"]
 
-def get_latest_model_ids() -> dict:
+# Cascade mode tries families cheapest first and escalates flagged pages
+CASCADE_ORDER = ["sonnet", "opus"]
+# Markers the prompt asks the model to use for words it could not read
+UNCERTAIN_MARKERS = ("(*)", "[?]")
+# Extra instruction sent with each band in tiled mode
+TILE_NOTE = ("This image is one horizontal strip cut from a journal page. "
+             "Transcribe every line visible in the strip, including lines cut off "
+             "at the top or bottom edge, and nothing else.")
+# Plausible characters per output token for English handwriting transcripts
+CHARS_PER_TOKEN_RANGE = (2.0, 6.0)
+
+def get_latest_model_ids(overrides: dict = None, refresh: bool = False,
+                         cache_file: Path = MODEL_CACHE, families: list = None) -> dict:
     """
-    Fetch the latest model IDs from Anthropic's Models API.
-    Returns a dictionary mapping model families to their latest model IDs.
+    Model IDs for families (default MODEL_FAMILIES): pinned overrides, then
+    the on-disk model registry (refreshed from Anthropic's Models API once it
+    expires). Returns a dictionary mapping model families to model IDs.
     """
-    print("🔍 DEBUG: Starting model ID retrieval...")
-    client = anthropic.Anthropic()
-    
-    try:
-        print("🔍 DEBUG: Making API call to client.models.list()...")
-        start_time = time.time()
-        models_response = client.models.list()
-        api_time = time.time() - start_time
-        print(f"🔍 DEBUG: API call completed in {api_time:.2f}s")
-        
-        available_models = [model.id for model in models_response.data]
-        print(f"🔍 DEBUG: Found {len(available_models)} total models from API")
-        print(f"🔍 DEBUG: Available models: {available_models}")
-        
-        # Find the latest model for each family
-        model_ids = {}
-        
-        # Look for the latest models in order of preference
-        for family in MODEL_FAMILIES:
-            print(f"🔍 DEBUG: Searching for {family.capitalize()} models...")
-            for model_id in available_models:
-                if family in model_id.lower() and family not in model_ids:
-                    model_ids[family] = model_id
-                    print(f"🔍 DEBUG: Found {family.capitalize()} model: {model_id}")
-                    break
-            else:
-                print(f"🔍 DEBUG: No {family.capitalize()} model found")
-        
-        print("🔡 Retrieved latest model IDs from API:")
-        for family, model_id in model_ids.items():
-            print(f"  {family}: {model_id}")
-        
-        print(f"🔍 DEBUG: Successfully mapped {len(model_ids)} model families")
-        return model_ids
-        
-    except Exception as e:
-        print(f"🔍 DEBUG: Exception during API call: {type(e).__name__}: {str(e)}")
-        print("⚠️ Failed to fetch latest models from API: {e}")
-        print("📄 Falling back to hardcoded model IDs...")
-        
-        # Fallback to hardcoded values if API call fails
-        fallback_models = {
-            "sonnet": "claude-sonnet-4-20250514",
-            "haiku":  "claude-3-5-haiku-20241022",
-            "opus":   "claude-opus-4-1-20250805",
-        }
-        print(f"🔍 DEBUG: Using fallback models: {fallback_models}")
-        return fallback_models
+    log.debug("Starting model ID retrieval...")
+    return resolve_model_ids(get_client(), families or MODEL_FAMILIES, overrides, refresh, cache_file)
 
 def load_prompt(prompt_file: Path) -> str:
     """Load base transcription prompt."""
-    print(f"🔍 DEBUG: Loading prompt from {prompt_file}")
-    
+    log.debug("Loading prompt from %s", prompt_file)
+
     if not prompt_file.exists():
-        print(f"🔍 DEBUG: ERROR - Prompt file does not exist: {prompt_file}")
         raise FileNotFoundError(f"Prompt file not found: {prompt_file}")
-    
-    try:
-        with open(prompt_file, "r", encoding="utf-8") as f:
-            content = f.read().strip()
-        
-        print(f"🔍 DEBUG: Loaded prompt - {len(content)} characters, {len(content.split())} words")
-        print(f"🔍 DEBUG: Prompt preview: '{content[:100]}{'...' if len(content) > 100 else ''}'")
-        return content
-        
-    except Exception as e:
-        print(f"🔍 DEBUG: ERROR reading prompt file: {type(e).__name__}: {str(e)}")
-        raise
 
+    with open(prompt_file, "r", encoding="utf-8") as f:
+        content = f.read().strip()
 
-def load_hints(hints_dir: Path) -> list:
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Loaded prompt - %d characters, %d words", len(content), len(content.split()))
+        log.debug("Prompt preview: '%s%s'", content[:100], "..." if len(content) > 100 else "")
+    return content
+
+
+def parse_hints(hints_dir: Path) -> list:
     """
-    Load OCR hint examples from hints.txt in the given directory.
+    Read hints.txt in the given directory.
 
     Format of hints.txt:
         img1 => "Pightle",
         img2 => Fernie's
-    
+
     Note: .png extension is automatically appended to identifiers.
+    Returns (image_path, transcription) pairs for hints whose image exists.
     """
-    print(f"🔍 DEBUG: Loading hints from directory: {hints_dir}")
     hints_file = hints_dir / "hints.txt"
-    
+
     if not hints_file.exists():
-        print(f"🔍 DEBUG: No hints file found at {hints_file}")
+        log.debug("No hints file found at %s", hints_file)
         return []
 
-    print(f"🔍 DEBUG: Found hints file: {hints_file}")
-    hints = []
-    processed_count = 0
-    skipped_count = 0
-    
+    with open(hints_file, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+
+    log.debug("Read %d lines from hints file %s", len(lines), hints_file)
+
+    pairs = []
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip().rstrip(",")  # strip whitespace and trailing commas
+
+        if not line or line.startswith("#"):
+            continue
+
+        parts = re.split(r"\s*=>\s*", line, maxsplit=1)
+        if len(parts) != 2:
+            log.debug("Skipping line %d (invalid format, got %d parts)", line_num, len(parts))
+            continue
+
+        img_identifier, correct_text = parts
+        # Append .png to the identifier to get the actual filename
+        img_path = hints_dir / f"{img_identifier}.png"
+
+        if not img_path.exists():
+            log.debug("Skipping line %d - image not found: %s", line_num, img_path)
+            continue
+
+        pairs.append((img_path, correct_text.strip()))
+    return pairs
+
+
+def load_hints(hints_dir: Path) -> list:
+    """
+    Load OCR hint examples from hints.txt in the given directory.
+
+    Each example becomes three content blocks: a label, the hint image and
+    its transcription.
+    """
+    log.debug("Loading hints from directory: %s", hints_dir)
     try:
-        with open(hints_file, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        
-        print(f"🔍 DEBUG: Read {len(lines)} lines from hints file")
-        
-        for line_num, line in enumerate(lines, 1):
-            original_line = line
-            line = line.strip().rstrip(",")  # strip whitespace and trailing commas
-            print(f"🔍 DEBUG: Line {line_num}: '{original_line.strip()}' -> '{line}'")
-            
-            if not line or line.startswith("#"):
-                print(f"🔍 DEBUG: Skipping line {line_num} (empty or comment)")
-                skipped_count += 1
-                continue
-                
-            parts = re.split(r"\s*=>\s*", line, maxsplit=1)
-            if len(parts) != 2:
-                print(f"🔍 DEBUG: Skipping line {line_num} (invalid format, got {len(parts)} parts)")
-                skipped_count += 1
-                continue
-                
-            img_identifier, correct_text = parts
-            # Append .png to the identifier to get the actual filename
-            img_name = f"{img_identifier}.png"
-            img_path = hints_dir / img_name
-            print(f"🔍 DEBUG: Processing hint: '{img_identifier}' -> '{img_name}' -> '{correct_text}' (path: {img_path})")
-            
-            if not img_path.exists():
-                print(f"🔍 DEBUG: Skipping line {line_num} - image not found: {img_path}")
-                skipped_count += 1
-                continue
-                
-            try:
-                with open(img_path, "rb") as imgf:
-                    img_data = imgf.read()
-                
-                img_size = len(img_data)
-                b64 = base64.b64encode(img_data).decode("utf-8")
-                b64_size = len(b64.encode("utf-8"))
-                
-                print(f"🔍 DEBUG: Encoded hint image {img_name} (from identifier '{img_identifier}'): {img_size} bytes -> {b64_size} bytes (base64)")
-                
-                # Add each hint as a complete example with clear pairing
-                hints.append({"type": "text", "text": f"Example {processed_count + 1}:"})
-                hints.append(
-                    {"type": "image",
-                     "source": {"type": "base64", "media_type": "image/png", "data": b64}}
-                )
-                hints.append({"type": "text", "text": f"Transcription: {correct_text.strip()}"})
-                processed_count += 1
-                
-            except Exception as e:
-                print(f"🔍 DEBUG: ERROR processing image {img_path} (from identifier '{img_identifier}'): {type(e).__name__}: {str(e)}")
-                skipped_count += 1
-                continue
-    
+        pairs = parse_hints(hints_dir)
     except Exception as e:
-        print(f"🔍 DEBUG: ERROR reading hints file: {type(e).__name__}: {str(e)}")
+        log.warning("⚠️ Could not read hints file in %s: %s: %s", hints_dir, type(e).__name__, e)
         return []
-    
-    print(f"🔍 DEBUG: Hints summary - processed: {processed_count}, skipped: {skipped_count}, total hint objects: {len(hints)}")
+
+    hints = []
+    processed_count = 0
+    for img_path, correct_text in pairs:
+        try:
+            with open(img_path, "rb") as imgf:
+                img_data = imgf.read()
+        except Exception as e:
+            log.debug("ERROR reading image %s: %s: %s", img_path, type(e).__name__, e)
+            continue
+
+        b64 = base64.b64encode(img_data).decode("utf-8")
+        log.debug("Encoded hint image %s: %d bytes -> %d bytes (base64)",
+                  img_path.name, len(img_data), len(b64))
+
+        # Add each hint as a complete example with clear pairing
+        hints.append({"type": "text", "text": f"Example {processed_count + 1}:"})
+        hints.append(
+            {"type": "image",
+             "source": {"type": "base64", "media_type": "image/png", "data": b64}}
+        )
+        hints.append({"type": "text", "text": f"Transcription: {correct_text}"})
+        processed_count += 1
+
+    log.debug("Hints summary - processed: %d, skipped: %d, total hint objects: %d",
+              processed_count, len(pairs) - processed_count, len(hints))
     return hints
 
 
-def build_messages(prompt_text: str, image: Path, hints: list):
-    """Build Anthropic message payload from prompt, hints, and a single image."""
-    print(f"🔍 DEBUG: Building messages for image: {image}")
-    print(f"🔍 DEBUG: Using {len(hints)} hint objects, prompt length: {len(prompt_text)} chars")
-    
+def load_hint_sheet(hints_dir: Path, cache_dir: Path) -> list:
+    """
+    Load the hints as one numbered contact-sheet image plus one text block.
+
+    The sheet is built by herbert.hint_sheet and cached in cache_dir, keyed
+    by a hash of hints.txt and the hint images.
+    """
+    pairs = parse_hints(hints_dir)
+    if not pairs:
+        return []
+
+    sheet = load_sheet(hints_dir / "hints.txt", [path for path, _ in pairs], cache_dir)
+    listing = "\n".join(f"{i}. {text}" for i, (_, text) in enumerate(pairs, 1))
+    return [
+        {"type": "text", "text": f"The image below shows {len(pairs)} numbered handwriting samples."},
+        {"type": "image",
+         "source": {"type": "base64", "media_type": "image/png",
+                    "data": base64.b64encode(sheet).decode("utf-8")}},
+        {"type": "text", "text": f"Transcriptions of the numbered samples:\n{listing}"},
+    ]
+
+
+def count_hint_tokens(client, model: str, hints: list) -> int:
+    """
+    Input tokens the hint blocks add to a request.
+
+    Uses the token-counting endpoint and falls back to a local estimate
+    (image area / 750 plus ~4 characters per text token) if that fails.
+    """
+    if not hints:
+        return 0
+    content = [{"type": "text", "text": "Examples of correct transcription:"}] + hints
+    return count_input_tokens(client, model, content, exact=True)
+
+
+def build_messages(prompt_text: str, image: Path, hints: list, image_data: bytes = None,
+                   note: str = None):
+    """
+    Build Anthropic message payload from prompt, hints, and a single image.
+
+    image_data overrides reading the image file (e.g. a cropped band of it),
+    and note is an extra instruction placed after the prompt.
+    """
     content = []
 
     # Add hints if available
     if hints:
-        hint_examples = len(hints) // 3  # Each hint is 3 objects: text, image, text
-        print(f"🔍 DEBUG: Adding {hint_examples} hint examples to content")
         content.append({"type": "text", "text": "Examples of correct transcription:"})
         content.extend(hints)
         content.append({"type": "text", "text": "Now transcribe the following page faithfully:"})
@@ -192,246 +209,931 @@ def build_messages(prompt_text: str, image: Path, hints: list):
     # Add the main prompt
     if prompt_text.strip():  # Only add if non-empty
         content.append({"type": "text", "text": prompt_text})
+    if note:
+        content.append({"type": "text", "text": note})
 
     # Encode and add the main image
-    try:
+    if image_data is None:
         with open(image, "rb") as f:
             img_data = f.read()
-        
-        img_size = len(img_data)
-        b64 = base64.b64encode(img_data).decode("utf-8")
-        b64_size = len(b64.encode("utf-8"))
-        
-        print(f"🔍 DEBUG: Encoded main image: {img_size} bytes -> {b64_size} bytes (base64)")
-        
-        content.append({
-            "type": "image",
-            "source": {"type": "base64", "media_type": "image/png", "data": b64},
-        })
-        
-    except Exception as e:
-        print(f"🔍 DEBUG: ERROR reading/encoding image {image}: {type(e).__name__}: {str(e)}")
-        raise
+    else:
+        img_data = image_data
+
+    b64 = base64.b64encode(img_data).decode("utf-8")
+    log.debug("Encoded main image %s: %d bytes -> %d bytes (base64)", image.name, len(img_data), len(b64))
+
+    content.append({
+        "type": "image",
+        "source": {"type": "base64", "media_type": "image/png", "data": b64},
+    })
 
-    total_content_items = len(content)
-    print(f"🔍 DEBUG: Built message with {total_content_items} content items")
-    
     # Validate that we have non-empty content
     if not content:
         raise ValueError("No content items generated for message")
-    
+
     # Check for empty text content (which causes the API error)
-    for i, item in enumerate(content):
-        if item["type"] == "text" and not item["text"].strip():
-            print(f"🔍 DEBUG: WARNING - Empty text content at index {i}")
-    
+    if log.isEnabledFor(logging.DEBUG):
+        for i, item in enumerate(content):
+            if item["type"] == "text" and not item["text"].strip():
+                log.debug("WARNING - Empty text content at index %d", i)
+
     return content
 
-def run_ocr(source_dir: str, label: str = "", max_tokens: int = 2000):
+
+def log_text_analysis(text: str) -> None:
+    """Debug-only summary of line and blank-line structure in a transcript."""
+    if not log.isEnabledFor(logging.DEBUG):
+        return
+
+    log.debug("Text preview: '%s%s'", text[:100], "..." if len(text) > 100 else "")
+    lines = text.split('\n')
+    blank_line_count = sum(1 for line in lines if line.strip() == '')
+    consecutive_blanks = []
+    current_blank_streak = 0
+    for line in lines:
+        if line.strip() == '':
+            current_blank_streak += 1
+        else:
+            if current_blank_streak > 0:
+                consecutive_blanks.append(current_blank_streak)
+                current_blank_streak = 0
+    if current_blank_streak > 0:  # Handle trailing blanks
+        consecutive_blanks.append(current_blank_streak)
+
+    log.debug("Text analysis - Total lines: %d, Blank lines: %d, consecutive blank runs: %s",
+              len(lines), blank_line_count, consecutive_blanks or "none")
+
+
+def stream_message(client, model: str, max_tokens: int, content: list, out_file: Path):
+    """
+    Stream a transcription into "<out_file>.partial" as it is generated.
+
+    The partial file is replaced atomically by out_file once the final
+    message arrives, so readers never see a half-written transcript under
+    the real name.
+
+    Returns (final_text, message, stats) where stats holds time-to-first-token,
+    output tokens/sec and the number of retries the SDK made.
+    """
+    partial_file = out_file.with_name(out_file.name + ".partial")
+    log.debug("Streaming response to: %s", partial_file)
+
+    start_time = time.time()
+    first_token_time = None
+    try:
+        with open(partial_file, "w", encoding="utf-8") as f:
+            with client.messages.stream(
+                model=model,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": content}],
+            ) as stream:
+                for text in stream.text_stream:
+                    if first_token_time is None and text:
+                        first_token_time = time.time()
+                        log.debug("First token after %.2fs", first_token_time - start_time)
+                    f.write(text)
+                    f.flush()
+                message = stream.get_final_message()
+                # The SDK tags each attempt with its retry number
+                retries = int(stream.response.request.headers.get("x-stainless-retry-count", 0))
+            end_time = time.time()
+
+            # Rewrite the partial with the normalized transcript before publishing it
+            text_raw = "".join(block.text for block in message.content if block.type == "text")
+            final_text = text_raw.strip()
+            if final_text:
+                final_text += "\n"
+            f.seek(0)
+            f.truncate()
+            f.write(final_text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(partial_file, out_file)
+    except Exception:
+        # Leave the partial file in place so the incomplete output can be inspected
+        log.debug("Stream aborted, partial output kept at %s", partial_file)
+        raise
+
+    if first_token_time is None:
+        first_token_time = end_time
+    ttft = first_token_time - start_time
+    generation_time = end_time - first_token_time
+    output_tokens = message.usage.output_tokens
+    stats = {
+        "ttft": ttft,
+        "total_time": end_time - start_time,
+        "output_tokens": output_tokens,
+        "tokens_per_sec": output_tokens / generation_time if generation_time > 0 else 0.0,
+        "retries": retries,
+    }
+    log.debug("Stream completed - ttft: %.2fs, %d tokens, %.1f tokens/s",
+              ttft, output_tokens, stats["tokens_per_sec"])
+    return final_text, message, stats
+
+
+def ocr_request(client, model: str, max_tokens: int, content: list, out_file: Path,
+                stream: bool = False) -> dict:
+    """
+    Send one transcription request and save the transcript to out_file.
+
+    Returns a dict with the transcript "text", the final "message", the
+    request "latency", SDK "retries" and, for streamed requests, "ttft"
+    and "tokens_per_sec".
+    """
+    if stream:
+        final_text, message, stats = stream_message(client, model, max_tokens, content, out_file)
+        log_text_analysis(final_text)
+        return {
+            "text": final_text,
+            "message": message,
+            "latency": stats["total_time"],
+            "retries": stats["retries"],
+            "ttft": stats["ttft"],
+            "tokens_per_sec": stats["tokens_per_sec"],
+        }
+
+    result = send_request(client, model, max_tokens, content)
+    log_text_analysis(result["text"])
+
+    with open(out_file, "w", encoding="utf-8") as f:
+        f.write(result["text"])
+
+    return result
+
+
+def send_request(client, model: str, max_tokens: int, content: list) -> dict:
+    """Make one non-streaming request; returns text, message, latency and retries."""
+    start_time = time.time()
+    raw_response = client.messages.with_raw_response.create(
+        model=model,
+        max_tokens=max_tokens,
+        messages=[{"role": "user", "content": content}],
+    )
+    message = raw_response.parse()
+    latency = time.time() - start_time
+    log.debug("API request completed in %.2fs", latency)
+
+    # Debug response structure
+    if log.isEnabledFor(logging.DEBUG):
+        for i, block in enumerate(message.content):
+            log.debug("Block %d: type=%s, length=%d", i, block.type, len(getattr(block, 'text', '')))
+
+    text_raw = "".join(block.text for block in message.content if block.type == "text")
+
+    # Clean the text by stripping whitespace
+    final_text = text_raw.strip()
+
+    # Ensure text ends with newline (Unix convention)
+    if final_text and not final_text.endswith('\n'):
+        final_text += '\n'
+
+    return {
+        "text": final_text,
+        "message": message,
+        "latency": latency,
+        "retries": getattr(raw_response, "retries_taken", 0),
+    }
+
+
+def ocr_tiled(client, model: str, max_tokens: int, prompt_text: str, hints: list,
+              image: Path, tiles: int, out_file: Path) -> dict:
+    """
+    OCR a page as overlapping horizontal bands sent concurrently, then stitch.
+
+    max_tokens is the planned budget for the whole page. Band requests are
+    planned like full pages: hints are fitted under the payload limit, and a
+    band cut off at its max_tokens is retried with a larger budget (see
+    planner.next_budget) so no lines are lost from the stitched page.
+
+    Returns the same shape as ocr_request(); "message" is a summary object
+    whose usage is summed over every band request (retries included) and
+    whose stop_reason is "max_tokens" if a band was still truncated at the
+    ceiling. "request_bytes" holds the total payload size of all band
+    requests; "requeued" and "hints_fitted" count planner actions.
+    """
+    bands = split_page(image, tiles)
+    # Each band only holds a few lines, so it needs far less output budget
+    band_tokens = max(256, max_tokens // len(bands) * 2)
+    contents = []
+    hints_fitted = 0
+    for band in bands:
+        content, _, fitted = fit_hints(
+            lambda h, band=band: build_messages(prompt_text, image, h, image_data=band, note=TILE_NOTE),
+            hints, model, band_tokens)
+        if fitted:
+            log.warning("Band request too large for the API limit: %s", fitted)
+            hints_fitted += 1
+        contents.append(content)
+    log.debug("Split %s into %d bands", image.name, len(bands))
+
+    def send_band(numbered):
+        number, content = numbered
+        budget = band_tokens
+        attempts = []
+        started = time.time()
+        while True:
+            attempts.append(send_request(client, model, budget, content))
+            larger = next_budget(budget) if attempts[-1]["message"].stop_reason == "max_tokens" else 0
+            if not larger:
+                break
+            log.warning("%s band %d (%s) was cut off at %d tokens; retrying with max_tokens %d",
+                        image.name, number, model, budget, larger)
+            budget = larger
+        result = dict(attempts[-1])
+        result.update(latency=time.time() - started, attempts=attempts, max_tokens=budget,
+                      request_bytes=len(json.dumps(content).encode("utf-8")) * len(attempts))
+        return result
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=len(contents)) as pool:
+        results = list(pool.map(send_band, enumerate(contents, 1)))
+    latency = time.time() - start_time
+
+    final_text = stitch_transcripts([r["text"] for r in results])
+    log_text_analysis(final_text)
+    with open(out_file, "w", encoding="utf-8") as f:
+        f.write(final_text)
+
+    usage = SimpleNamespace(**{
+        key: sum(usage_fields(a["message"].usage)[key] for r in results for a in r["attempts"])
+        for key in ("input_tokens", "output_tokens",
+                    "cache_creation_input_tokens", "cache_read_input_tokens")
+    })
+    stop_reasons = [r["message"].stop_reason for r in results]
+    message = SimpleNamespace(
+        usage=usage,
+        stop_reason="max_tokens" if "max_tokens" in stop_reasons else stop_reasons[-1],
+        content=[],
+    )
+    return {
+        "text": final_text,
+        "message": message,
+        "latency": latency,
+        "retries": sum(a["retries"] for r in results for a in r["attempts"]),
+        "tiles": len(results),
+        "band_latencies": [r["latency"] for r in results],
+        "band_max_tokens": [r["max_tokens"] for r in results],
+        "request_bytes": sum(r["request_bytes"] for r in results),
+        "requeued": sum(len(r["attempts"]) - 1 for r in results),
+        "hints_fitted": hints_fitted,
+    }
+
+
+def count_reference_lines(ref_file: Path):
+    """Non-blank line count of a manual transcript page, or None if there isn't one."""
+    if not ref_file.exists():
+        return None
+    with open(ref_file, "r", encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def assess_transcript(text: str, message, expected_lines: int = None,
+                      max_uncertain: int = 3) -> list:
+    """
+    Cheap local checks on a transcript; returns the reasons it looks unreliable.
+
+    Each reason is "<check>: <detail>". An empty list means the transcript can be accepted without asking a
+    stronger model.
+    """
+    reasons = []
+    if message.stop_reason == "max_tokens":
+        reasons.append("truncated: stop_reason max_tokens")
+
+    stripped = text.strip()
+    if not stripped:
+        reasons.append("empty: no text returned")
+        return reasons
+
+    output_tokens = message.usage.output_tokens or 0
+    if output_tokens:
+        ratio = len(stripped) / output_tokens
+        low, high = CHARS_PER_TOKEN_RANGE
+        if not low <= ratio <= high:
+            reasons.append(f"token-ratio: {ratio:.1f} chars/token")
+
+    uncertain = sum(stripped.count(marker) for marker in UNCERTAIN_MARKERS)
+    if uncertain > max_uncertain:
+        reasons.append(f"uncertain: {uncertain} uncertain-word markers")
+
+    if expected_lines:
+        lines = sum(1 for line in stripped.splitlines() if line.strip())
+        if abs(lines - expected_lines) > max(2, expected_lines * 0.15):
+            reasons.append(f"line-count: {lines} lines vs {expected_lines} expected")
+
+    return reasons
+
+
+def summarize_cascade(pages: list, families: list, metrics: RunMetrics, history: OutputHistory = None) -> dict:
+    """
+    Escalation rate and estimated savings of a cascade run.
+
+    Each skipped request's cost is the skipped family's list price applied to
+    the tokens of the request that was accepted for the page. Its latency is
+    the average the skipped family showed on escalated pages in this run, or
+    failing that in earlier run reports (see OutputHistory.latency).
+    """
+    by_family = {}
+    accepted = {}
+    for entry in metrics.requests:
+        if entry["ok"]:
+            by_family.setdefault(entry["family"], []).append(entry)
+            accepted.setdefault((entry["page"], entry["family"]), entry)
+
+    escalated = sum(1 for p in pages if len(p["families"]) > 1)
+    requests_saved = 0
+    latency_saved = 0.0
+    cost_saved = 0.0
+    latency_unknown = 0
+    for page in pages:
+        base = accepted.get((page["page"], page["accepted"]))
+        for family in families:
+            if family in page["families"]:
+                continue
+            requests_saved += 1
+            if base:
+                cost_saved += estimate_cost(family, base["input_tokens"], base["output_tokens"],
+                                            base["cache_creation_input_tokens"], base["cache_read_input_tokens"])
+            samples = by_family.get(family, [])
+            model = metrics.model_ids.get(family)
+            if samples:
+                latency_saved += sum(s["latency"] for s in samples) / len(samples)
+            elif history and model and history.latency(page["page"], model) is not None:
+                latency_saved += history.latency(page["page"], model)
+            else:
+                latency_unknown += 1
+
+    reason_counts = {}
+    for page in pages:
+        for reasons in page["reasons"].values():
+            for reason in reasons:
+                key = reason.split(":")[0]
+                reason_counts[key] = reason_counts.get(key, 0) + 1
+
+    return {
+        "order": families,
+        "pages": len(pages),
+        "escalated": escalated,
+        "escalation_rate": escalated / len(pages) if pages else 0.0,
+        "requests_saved": requests_saved,
+        "latency_saved_sec": latency_saved,
+        "latency_unknown_requests": latency_unknown,
+        "cost_saved": cost_saved,
+        "reasons": reason_counts,
+        "accepted": {f: sum(1 for p in pages if p["accepted"] == f) for f in families},
+        "page_details": pages,
+    }
+
+
+def compare_hint_layouts(metrics: RunMetrics, run_hints: dict, output_dir: Path, ref_dir: Path,
+                         report_dir: Path) -> dict:
+    """
+    Latency and accuracy of a --hint-sheet run against the last separate-hints run.
+
+    The baseline is the newest run report against the same API endpoint that
+    sent the same hints as separate images, with the same prompt, full pages
+    (no --tiles) and at least this run's model families. Runs whose
+    transcripts have since been overwritten (by this run or any later run
+    with the same label) are skipped.
+    Only pages and models present in both runs are compared: mean request
+    latency from the two reports, and CER of both transcripts against the
+    manual transcript where one exists. Returns None if there is no such run.
+    """
+    baseline = None
+    # (label, family) transcripts written after the report being looked at
+    overwritten = {(metrics.label, family) for family in run_hints["families"]}
+    for report_file in sorted(Path(report_dir).glob("run_*.json"), reverse=True):
+        try:
+            with open(report_file, "r", encoding="utf-8") as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summary = report.get("summary", {})
+        hints = report.get("hints", {})
+        label = summary.get("label", "")
+        stale = any((label, family) in overwritten for family in run_hints["families"])
+        overwritten |= {(label, family) for family in summary.get("families", {})}
+        if (summary.get("api_base_url") == metrics.api_base_url
+                and not stale
+                and hints.get("layout") == "separate"
+                and not hints.get("tiles")
+                and hints.get("prompt") == run_hints["prompt"]
+                and hints.get("hints_dir") == run_hints["hints_dir"]
+                and set(run_hints["families"]) <= set(hints.get("families", []))):
+            baseline = report
+            break
+    if baseline is None:
+        return None
+
+    def latencies(requests):
+        found = {}
+        for r in requests:
+            if r["ok"] and not r.get("cached") and not r.get("tiles"):
+                found.setdefault((r["page"], r["family"]), []).append(r["latency"])
+        return {key: sum(values) / len(values) for key, values in found.items()}
+
+    sheet = latencies(metrics.requests)
+    separate = latencies(baseline["requests"])
+    sheet_suffix = f"_{metrics.label}" if metrics.label else ""
+    separate_label = baseline["summary"].get("label")
+    separate_suffix = f"_{separate_label}" if separate_label else ""
+
+    families = {}
+    for page, family in sorted(set(sheet) & set(separate)):
+        stats = families.setdefault(family, {"pages": 0, "sheet_latency": 0.0, "separate_latency": 0.0,
+                                             "scored_pages": 0, "chars": 0,
+                                             "sheet_char_errors": 0, "separate_char_errors": 0})
+        stats["pages"] += 1
+        stats["sheet_latency"] += sheet[(page, family)]
+        stats["separate_latency"] += separate[(page, family)]
+        ref_file = ref_dir / f"{page}.txt"
+        sheet_file = output_dir / f"{page}_{family}{sheet_suffix}.txt"
+        separate_file = output_dir / f"{page}_{family}{separate_suffix}.txt"
+        if sheet_file != separate_file and ref_file.exists() and sheet_file.exists() and separate_file.exists():
+            reference = ref_file.read_text(encoding="utf-8")
+            sheet_score = score_page(reference, sheet_file.read_text(encoding="utf-8"), hotspots=0)
+            separate_score = score_page(reference, separate_file.read_text(encoding="utf-8"), hotspots=0)
+            stats["scored_pages"] += 1
+            stats["chars"] += sheet_score["chars"]
+            stats["sheet_char_errors"] += sheet_score["char_errors"]
+            stats["separate_char_errors"] += separate_score["char_errors"]
+
+    if not families:
+        return None
+    for stats in families.values():
+        stats["sheet_latency"] /= stats["pages"]
+        stats["separate_latency"] /= stats["pages"]
+        stats["latency_saved_per_request"] = stats["separate_latency"] - stats["sheet_latency"]
+        if stats["chars"]:
+            stats["sheet_cer"] = stats["sheet_char_errors"] / stats["chars"]
+            stats["separate_cer"] = stats["separate_char_errors"] / stats["chars"]
+    return {"baseline_label": separate_label, "baseline_started": baseline["summary"].get("started"),
+            "families": families}
+
+
+def run_ocr(source_dir: str, label: str = "", max_tokens: int = 2000, stream: bool = False,
+            cascade: bool = False, tiles: int = 0, hint_sheet: bool = False, on_page=None,
+            concurrency: int = 1, models: dict = None, refresh_models: bool = False,
+            only: set = None, exact_tokens: bool = False, dedup: int = None,
+            prompt_file: str = None, hints_dir: str = None, use_hints: bool = True,
+            families: list = None, result_cache: ResultCache = None, rate_limit: float = None,
+            output_root: str = None):
     """
     Run OCR on images in a source directory using Anthropic API.
 
+    Every request is recorded in a RunMetrics report which is written to
+    output/ocr_reports and summarized at the end of the run.
+
     Args:
         source_dir: Path to directory containing images & prompt.txt
         label: Optional string appended to output filenames (e.g. "test1")
         max_tokens: Max tokens for model output
-    """
-    print(f"🔍 DEBUG: Starting OCR run - source_dir: '{source_dir}', label: '{label}', max_tokens: {max_tokens}")
+        stream: Stream responses to "<output>.partial" files and record
+                time-to-first-token and tokens/sec per model
+        cascade: OCR with the cheapest family in CASCADE_ORDER first and only
+                 escalate pages that assess_transcript() flags
+        tiles: Split each page into this many overlapping bands and OCR them
+               concurrently (needs the "tiles" extra); the stitched result is
+               compared with any existing full-page output for the same model
+        hint_sheet: Send the hints as one cached contact-sheet image instead of
+                    one image block per hint
+        on_page: Optional callback(stem, variant, text) called as soon as each
+                 transcript is saved, e.g. PagePublisher.publish
+        concurrency: Number of pages to OCR in parallel
+        models: Optional {family: model_id} pins that override the model registry
+        refresh_models: Refetch the model list even if the cached copy is fresh
+        only: Optional set of (image stem, family) pairs; everything else is skipped
+        exact_tokens: Count input tokens with the token-counting endpoint instead
+                      of estimating them locally
+        dedup: If set, group near-duplicate scans whose perceptual hashes are
+               within this many bits, OCR one page per group and copy its
+               transcripts to the others (needs the "tiles" extra)
+        prompt_file: Prompt to use instead of data/ocr_prompt.txt
+        hints_dir: Hints directory to use instead of data/ocr_hints
+        use_hints: Set False to send no hint examples at all
+        families: Model families to run instead of MODEL_FAMILIES
+        result_cache: Optional ResultCache; identical requests reuse its stored
+                      responses and new complete responses are added to it
+        rate_limit: Optional maximum requests per minute for this run
+        output_root: Directory for transcripts, reports and caches instead of
+                     output/ (the manual transcript is still read from output/txt)
 
-    # Dynamically fetch latest model IDs (with fallback if API call fails)
-    print("🔍 DEBUG: Fetching model IDs...")
-    model_ids = get_latest_model_ids()
-    print(f"🔍 DEBUG: Got model IDs: {model_ids}")
+    max_tokens is only the starting budget for pages with no history: each
+    page's budget is sized from recent run reports (see herbert.planner),
+    and responses cut off at max_tokens are retried with a larger budget.
+    """
+    log.debug("Starting OCR run - source_dir: '%s', label: '%s', max_tokens: %d, stream: %s, "
+              "cascade: %s, tiles: %d, concurrency: %d",
+              source_dir, label, max_tokens, stream, cascade, tiles, concurrency)
+    if only is not None and cascade:
+        log.warning("Cascade mode decides its own models per page; ignoring it for a targeted rerun")
+        cascade = False
+    if tiles > 1 and stream:
+        log.warning("Tiled mode sends short band requests; --stream is ignored")
+        stream = False
 
     source = Path(source_dir)
-    print(f"🔍 DEBUG: Source path resolved to: {source.absolute()}")
-    
+
     if not source.exists():
-        print(f"🔍 DEBUG: ERROR - Source directory does not exist: {source}")
         raise FileNotFoundError(f"Source directory not found: {source}")
-    
+
     if not source.is_dir():
-        print(f"🔍 DEBUG: ERROR - Source path is not a directory: {source}")
         raise NotADirectoryError(f"Source path is not a directory: {source}")
 
     # Both prompt file and hints directory are now relative to repo root
     repo_root = Path(__file__).resolve().parents[2]
-    prompt_file = repo_root / "data" / "ocr_prompt.txt"
-    print(f"🔍 DEBUG: Looking for prompt file at: {prompt_file} (repo root: {repo_root})")
-    
+
+    # Model IDs from pins or the cached registry (with fallback if the API call fails)
+    wanted_families = families or MODEL_FAMILIES
+    output_root = Path(output_root) if output_root else repo_root / "output"
+    model_ids = get_latest_model_ids(models, refresh_models, output_root / "cache" / "models.json",
+                                     wanted_families)
+    prompt_file = Path(prompt_file) if prompt_file else repo_root / "data" / "ocr_prompt.txt"
+
     if not prompt_file.exists():
-        print(f"🔍 DEBUG: ERROR - Prompt file not found: {prompt_file}")
-        raise FileNotFoundError(f"ocr_prompt.txt not found at {prompt_file}")
-
-    hints_dir = repo_root / "data" / "ocr_hints"
-    print(f"🔍 DEBUG: Checking for hints directory at: {hints_dir}")
-    
-    if hints_dir.exists():
-        print(f"🔍 DEBUG: Hints directory found, loading hints...")
+        raise FileNotFoundError(f"Prompt file not found at {prompt_file}")
+
+    hints_dir = Path(hints_dir) if hints_dir else repo_root / "data" / "ocr_hints"
+
+    if not use_hints:
+        log.debug("Hints disabled for this run")
+        hints = []
+    elif hints_dir.exists():
         hints = load_hints(hints_dir)
     else:
-        print(f"🔍 DEBUG: No hints directory found at {hints_dir}")
+        log.debug("No hints directory found at %s", hints_dir)
         hints = []
+    hint_examples = len(hints) // 3  # Each example is 3 items: label, image, transcription
+
+    # Load the contact sheet up front; the token difference is measured once the client exists
+    separate_hints = hints
+    if hint_sheet and hints:
+        hints = load_hint_sheet(hints_dir, output_root / "cache")
 
-    print(f"🔍 DEBUG: Loading prompt from centralized location...")
     prompt_text = load_prompt(prompt_file)
 
-    print(f"🔍 DEBUG: Scanning for PNG images in {source}")
-    all_files = list(source.iterdir())
-    print(f"🔍 DEBUG: Found {len(all_files)} total files/directories")
-    
-    images = sorted([p for p in all_files if p.suffix.lower() == ".png"])
-    print(f"🔍 DEBUG: Found {len(images)} PNG images: {[img.name for img in images]}")
-    
+    images = sorted([p for p in source.iterdir() if p.suffix.lower() == ".png"])
+    log.debug("Found %d PNG images in %s", len(images), source)
+    if only is not None:
+        images = [img for img in images if any(img.stem == stem for stem, _ in only)]
+
     if not images:
-        print(f"🔍 DEBUG: ERROR - No PNG images found")
         raise FileNotFoundError(f"No .png images found in {source}")
 
+    # Near-duplicate scans share the transcript of their group's first page
+    duplicates = {}
+    if dedup is not None:
+        groups = group_duplicates(images, dedup)
+        duplicates = {group[0]: group[1:] for group in groups if len(group) > 1}
+        for rep, others in duplicates.items():
+            log.info("🪞 %s has %d near-duplicate(s): %s", rep.name, len(others), ", ".join(p.name for p in others))
+        images = [group[0] for group in groups]
+
     # Output directory relative to repo root
-    output_dir = repo_root / "output" / "ocr_pages"
-    print(f"🔍 DEBUG: Output directory: {output_dir.absolute()}")
-    
-    print(f"🔍 DEBUG: Creating output directory (if needed)...")
+    output_dir = output_root / "ocr_pages"
     output_dir.mkdir(parents=True, exist_ok=True)
-    print(f"🔍 DEBUG: Output directory ready")
-
-    print(f"🔍 DEBUG: Initializing Anthropic client...")
-    client = anthropic.Anthropic()
-    print(f"🔍 DEBUG: Client initialized")
-
-    total_requests = len(images) * len([f for f in MODEL_FAMILIES if f in model_ids])
-    current_request = 0
-    
-    print(f"🔍 DEBUG: Will process {len(images)} images x {len(model_ids)} models = {total_requests} total requests")
-
-    for img_idx, img in enumerate(images, 1):
-        print(f"\n🔍 DEBUG: ===== Processing image {img_idx}/{len(images)}: {img.name} =====")
-        
-        for family in MODEL_FAMILIES:
-            current_request += 1
-            print(f"\n🔍 DEBUG: ----- Request {current_request}/{total_requests}: {img.name} with {family} -----")
-            
-            if family not in model_ids:
-                print(f"🔍 DEBUG: Skipping {family}: no model ID found")
-                print(f"⚠️ Skipping {family}: no model ID found")
-                continue
-                
-            model = model_ids[family]
-            print(f"🔍 DEBUG: Using model: {model}")
+    log.debug("Output directory: %s", output_dir)
 
-            # Build request content using the proper function
-            print(f"🔍 DEBUG: Building request content...")
-            try:
-                content = build_messages(prompt_text, img, hints)
-                print(f"🔍 DEBUG: Content built with {len(content)} items")
-            except Exception as e:
-                print(f"🔍 DEBUG: ERROR building content: {type(e).__name__}: {str(e)}")
-                continue
+    client = get_client()
 
-            # Estimate total request size
-            print(f"🔍 DEBUG: Estimating request size...")
-            try:
-                payload = {
-                    "model": model,
-                    "max_tokens": max_tokens,
-                    "messages": [{"role": "user", "content": content}],
-                }
-                request_json = json.dumps(payload)
-                request_size = len(request_json.encode("utf-8"))
-                print(f"🔍 DEBUG: Request JSON size: {request_size} bytes ({request_size/1024/1024:.2f} MB)")
-                
-            except Exception as e:
-                print(f"🔍 DEBUG: ERROR estimating request size: {type(e).__name__}: {str(e)}")
-                request_size = 0
-
-            print(f"\n--- Processing {img.name} with {family} ---")
-            print(f"  Request size:   {request_size/1024/1024:.2f} MB (JSON payload)")
-            print(f"  Prompt length:  {len(prompt_text.split())} words")
-            print(f"  Hints used:     {len(hints)//3} examples")  # Now 3 items per example
-            if request_size > 9*1024*1024:
-                print("  ⚠️ WARNING: request is close to 10 MB API limit!")
-                print(f"🔍 DEBUG: Request size warning - {request_size} bytes vs 10MB limit")
-
-            # Send request
-            print(f"🔍 DEBUG: Sending API request...")
+    families = [f for f in wanted_families if f in model_ids]
+    for family in wanted_families:
+        if family not in model_ids:
+            log.warning("⚠️ Skipping %s: no model ID found", family)
+    if cascade:
+        families = [f for f in CASCADE_ORDER if f in model_ids]
+
+    total_requests = len(images) * len(families)
+    suffix = f"_{label}" if label else ""
+    metrics = RunMetrics(label, model_ids)
+    ref_dir = repo_root / "output" / "txt"
+    history = OutputHistory(output_root / "ocr_reports")
+    limiter = RateLimiter(rate_limit) if rate_limit else None
+    plan_stats = {"hints_fitted": 0, "requeued": 0}
+    plan_lock = threading.Lock()
+
+    if hint_sheet and hints and families:
+        model = model_ids[families[0]]
+        separate_tokens = count_hint_tokens(client, model, separate_hints)
+        sheet_tokens = count_hint_tokens(client, model, hints)
+        separate_bytes = len(json.dumps(separate_hints).encode("utf-8"))
+        sheet_bytes = len(json.dumps(hints).encode("utf-8"))
+        metrics.add_section("hint_sheet", {
+            "examples": hint_examples,
+            "separate_input_tokens": separate_tokens,
+            "sheet_input_tokens": sheet_tokens,
+            "input_tokens_saved_per_request": separate_tokens - sheet_tokens,
+            "separate_bytes": separate_bytes,
+            "sheet_bytes": sheet_bytes,
+        })
+        log.info("🧩 Hint contact sheet: %d input tokens vs %d for %d separate images "
+                 "(%+d per request), %d vs %d payload bytes",
+                 sheet_tokens, separate_tokens, hint_examples, sheet_tokens - separate_tokens,
+                 sheet_bytes, separate_bytes)
+    run_hints = None
+    if hints:
+        # Lets later --hint-sheet runs find a comparable separate-hints run
+        run_hints = {"examples": hint_examples, "layout": "sheet" if hint_sheet else "separate",
+                     "hints_dir": str(hints_dir.resolve()), "tiles": tiles > 1, "families": families,
+                     "prompt": hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()[:16]}
+        metrics.add_section("hints", run_hints)
+
+    log.debug("Will process %d images x %d models = up to %d requests%s",
+              len(images), len(families), total_requests, " (cascade)" if cascade else "")
+
+    def deliver(img: Path, variant: str, text: str):
+        """Hand a finished transcript to on_page (and to img's duplicates) without breaking the run."""
+        for dup in duplicates.get(img, []):
+            dup_file = output_dir / f"{dup.stem}_{variant}.txt"
+            with open(dup_file, "w", encoding="utf-8") as f:
+                f.write(text)
+            log.info("🪞 Linked %s (%s) -> %s", img.name, variant, dup_file)
+        if on_page is None:
+            return
+        for page in [img] + duplicates.get(img, []):
             try:
-                start_time = time.time()
-                response = client.messages.create(
-                    model=model,
-                    max_tokens=max_tokens,
-                    messages=[{"role": "user", "content": content}],
-                )
-                api_time = time.time() - start_time
-                print(f"🔍 DEBUG: API request completed in {api_time:.2f}s")
-                
-                # Debug response structure
-                print(f"🔍 DEBUG: Response type: {type(response)}")
-                print(f"🔍 DEBUG: Response content blocks: {len(response.content)}")
-                for i, block in enumerate(response.content):
-                    print(f"🔍 DEBUG: Block {i}: type={block.type}, length={len(getattr(block, 'text', ''))}")
-                
-                text_blocks = [block for block in response.content if block.type == "text"]
-                text_raw = "".join(block.text for block in text_blocks)
-                
-                print(f"🔍 DEBUG: Extracted text length: {len(text_raw)} characters")
-                print(f"🔍 DEBUG: Text preview: '{text_raw[:100]}{'...' if len(text_raw) > 100 else ''}'")
-                
-                # Clean the text by stripping whitespace
-                final_text = text_raw.strip()
-                print(f"🔍 DEBUG: Final text length after stripping: {len(final_text)} characters")
-                
-                # Analyze blank line patterns for debugging
-                lines = final_text.split('\n')
-                blank_line_count = sum(1 for line in lines if line.strip() == '')
-                consecutive_blanks = []
-                current_blank_streak = 0
-                for line in lines:
-                    if line.strip() == '':
-                        current_blank_streak += 1
-                    else:
-                        if current_blank_streak > 0:
-                            consecutive_blanks.append(current_blank_streak)
-                            current_blank_streak = 0
-                if current_blank_streak > 0:  # Handle trailing blanks
-                    consecutive_blanks.append(current_blank_streak)
-                
-                print(f"🔍 DEBUG: Text analysis - Total lines: {len(lines)}, Blank lines: {blank_line_count}")
-                if consecutive_blanks:
-                    print(f"🔍 DEBUG: Consecutive blank line patterns: {consecutive_blanks}")
-                else:
-                    print(f"🔍 DEBUG: No consecutive blank lines found")
-                
-                # Ensure text ends with newline (Unix convention)
-                if final_text and not final_text.endswith('\n'):
-                    final_text += '\n'
-                    print(f"🔍 DEBUG: Added trailing newline")
-                elif final_text.endswith('\n'):
-                    print(f"🔍 DEBUG: Text already ends with newline")
-                else:
-                    print(f"🔍 DEBUG: Empty text, no newline needed")
-                
+                on_page(page.stem, variant, text)
             except Exception as e:
-                print(f"🔍 DEBUG: ERROR during API request: {type(e).__name__}: {str(e)}")
-                print(f"❌ API request failed for {img.name} ({family}): {str(e)}")
-                continue
+                log.error("❌ on_page failed for %s (%s): %s: %s", page.name, variant, type(e).__name__, e)
+
+    def process(img: Path, family: str):
+        """OCR one image with one model family; returns the ocr_request result or None."""
+        model = model_ids[family]
+        raw_file = output_dir / f"{img.stem}_{family}{suffix}.txt"
+
+        if tiles > 1:
+            return process_tiled(img, family, model, raw_file)
+
+        # Build request content, shrinking or dropping hints if it would exceed the size limit
+        budget = history.budget(img.stem, model, max_tokens)
+        try:
+            content, _, fitted = fit_hints(lambda h: build_messages(prompt_text, img, h), hints, model, budget)
+        except Exception as e:
+            log.error("❌ Could not build request for %s: %s: %s", img.name, type(e).__name__, e)
+            return None
+        request_size = payload_bytes(model, budget, content)
+        input_tokens = count_input_tokens(client, model, content, exact=exact_tokens)
+
+        log.info("\n--- Processing %s with %s ---", img.name, family)
+        log.info("  Request size:   %.2f MB (JSON payload)", request_size / 1024 / 1024)
+        if log.isEnabledFor(logging.INFO):
+            log.info("  Prompt length:  %d words", len(prompt_text.split()))
+        log.info("  Hints used:     %d examples%s", hint_examples, " (contact sheet)" if hint_sheet else "")
+        log.info("  Token budget:   %s%d in, max %d out", "" if exact_tokens else "~", input_tokens, budget)
+        if fitted:
+            log.warning("Request too large for the API limit: %s", fitted)
+            with plan_lock:
+                plan_stats["hints_fitted"] += 1
+
+        cache_key = result_cache.key(model, content) if result_cache else None
+        cached = result_cache.get(cache_key) if cache_key else None
+        if cached:
+            with open(raw_file, "w", encoding="utf-8") as f:
+                f.write(cached["text"])
+            message = SimpleNamespace(stop_reason=cached["stop_reason"], usage=SimpleNamespace(**cached["usage"]))
+            metrics.record(img.stem, family, model, cached["latency"], usage=message.usage,
+                           request_bytes=request_size, stop_reason=message.stop_reason,
+                           max_tokens=budget, estimated_input_tokens=input_tokens, cached=True)
+            log.info("♻️ Cached result: %s (%s) -> %s", img.name, family, raw_file)
+            deliver(img, f"{family}{suffix}", cached["text"])
+            return {"text": cached["text"], "message": message, "latency": cached["latency"],
+                    "retries": 0, "file": raw_file}
 
-            # Save output
+        # Send request and save output, retrying with a larger budget if the transcript was cut off
+        while True:
+            if limiter:
+                limiter.wait()
+            start_time = time.time()
             try:
-                suffix = f"_{label}" if label else ""
-                raw_file = output_dir / f"{img.stem}_{family}{suffix}.txt"
-                print(f"🔍 DEBUG: Saving output to: {raw_file}")
-                
-                with open(raw_file, "w", encoding="utf-8") as f:
-                    f.write(final_text)
-                
-                saved_size = raw_file.stat().st_size
-                print(f"🔍 DEBUG: Saved {saved_size} bytes to {raw_file}")
-                print(f"✅ OCR complete: {img.name} ({family}) -> {raw_file}")
-                
+                result = ocr_request(client, model, budget, content, raw_file, stream=stream)
             except Exception as e:
-                print(f"🔍 DEBUG: ERROR saving output: {type(e).__name__}: {str(e)}")
-                print(f"❌ Failed to save output for {img.name} ({family}): {str(e)}")
+                log.error("❌ API request failed for %s (%s): %s: %s", img.name, family, type(e).__name__, e)
+                metrics.record(img.stem, family, model, time.time() - start_time,
+                               request_bytes=request_size, ok=False, error=f"{type(e).__name__}: {e}",
+                               max_tokens=budget, estimated_input_tokens=input_tokens)
+                return None
+
+            message = result["message"]
+            stream_fields = {k: result[k] for k in ("ttft", "tokens_per_sec") if k in result}
+            metrics.record(img.stem, family, model, result["latency"], usage=message.usage,
+                           request_bytes=request_size, stop_reason=message.stop_reason,
+                           retries=result["retries"], max_tokens=budget,
+                           estimated_input_tokens=input_tokens, **stream_fields)
+
+            log.info("  Latency:        %.2fs (%d in / %d out tokens, stop: %s)",
+                     result["latency"], message.usage.input_tokens, message.usage.output_tokens,
+                     message.stop_reason)
+            if stream:
+                log.info("  First token:    %.2fs", result["ttft"])
+                log.info("  Throughput:     %.1f tokens/s", result["tokens_per_sec"])
+            larger = next_budget(budget) if message.stop_reason == "max_tokens" else 0
+            if not larger:
+                break
+            log.warning("%s (%s) was cut off at %d tokens; retrying with max_tokens %d",
+                        img.name, family, budget, larger)
+            with plan_lock:
+                plan_stats["requeued"] += 1
+            budget = larger
+
+        if cache_key and message.stop_reason != "max_tokens":
+            result_cache.put(cache_key, {"model": model, "text": result["text"], "latency": result["latency"],
+                                         "stop_reason": message.stop_reason, "usage": usage_fields(message.usage)})
+        log.info("✅ OCR complete: %s (%s) -> %s", img.name, family, raw_file)
+        result["file"] = raw_file
+        deliver(img, f"{family}{suffix}", result["text"])
+        return result
+
+    def process_tiled(img: Path, family: str, model: str, raw_file: Path):
+        """Tiled variant of process(): bands in parallel, checked against full-page output."""
+        log.info("\n--- Processing %s with %s in %d bands ---", img.name, family, tiles)
+        budget = history.budget(img.stem, model, max_tokens)
+        if limiter:
+            limiter.wait()
+        start_time = time.time()
+        try:
+            result = ocr_tiled(client, model, budget, prompt_text, hints, img, tiles, raw_file)
+        except Exception as e:
+            log.error("❌ Tiled OCR failed for %s (%s): %s: %s", img.name, family, type(e).__name__, e)
+            metrics.record(img.stem, family, model, time.time() - start_time,
+                           ok=False, error=f"{type(e).__name__}: {e}")
+            return None
+
+        with plan_lock:
+            plan_stats["requeued"] += result["requeued"]
+            plan_stats["hints_fitted"] += result["hints_fitted"]
+
+        # Validate against a full-page transcript from an earlier unlabelled run
+        extra = {"tiles": result["tiles"], "band_latencies": result["band_latencies"],
+                 "band_max_tokens": result["band_max_tokens"], "max_tokens": budget}
+        full_file = output_dir / f"{img.stem}_{family}.txt"
+        if full_file != raw_file and full_file.exists():
+            agreement = score_page(full_file.read_text(encoding="utf-8"), result["text"], hotspots=0)
+            extra["cer_vs_full_page"] = agreement["cer"]
+            log.info("  vs full page:   %.2f%% CER (%s)", agreement["cer"] * 100, full_file.name)
+
+        message = result["message"]
+        metrics.record(img.stem, family, model, result["latency"], usage=message.usage,
+                       request_bytes=result["request_bytes"], stop_reason=message.stop_reason,
+                       retries=result["retries"], **extra)
+        log.info("  Latency:        %.2fs wall, slowest band %.2fs (%d in / %d out tokens)",
+                 result["latency"], max(result["band_latencies"]),
+                 message.usage.input_tokens, message.usage.output_tokens)
+        log.info("✅ OCR complete: %s (%s) -> %s", img.name, family, raw_file)
+        result["file"] = raw_file
+        deliver(img, f"{family}{suffix}", result["text"])
+        return result
+
+    cascade_pages = []
+
+    def process_page(img_idx: int, img: Path):
+        log.debug("===== Processing image %d/%d: %s =====", img_idx, len(images), img.name)
+
+        if not cascade:
+            for family in families:
+                if only is None or (img.stem, family) in only:
+                    process(img, family)
+            return
+
+        # Cascade: stop at the first family whose transcript passes the checks
+        expected_lines = count_reference_lines(ref_dir / f"{img.stem}.txt")
+        page = {"page": img.stem, "families": [], "reasons": {}, "accepted": None}
+        for family in families:
+            result = process(img, family)
+            page["families"].append(family)
+            if result is None:
+                page["reasons"][family] = ["request failed"]
                 continue
+            reasons = assess_transcript(result["text"], result["message"], expected_lines)
+            page["accepted"] = family
+            if not reasons:
+                break
+            page["reasons"][family] = reasons
+            if family != families[-1]:
+                log.info("⤴️ Escalating %s: %s", img.name, "; ".join(reasons))
+        if page["accepted"]:
+            accepted_file = output_dir / f"{img.stem}_{page['accepted']}{suffix}.txt"
+            shutil.copyfile(accepted_file, output_dir / f"{img.stem}_cascade{suffix}.txt")
+            deliver(img, f"cascade{suffix}", accepted_file.read_text(encoding="utf-8"))
+        cascade_pages.append(page)
+
+    if concurrency > 1:
+        # Pages run in parallel; each page still tries its families in order
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(process_page, img_idx, img) for img_idx, img in enumerate(images, 1)]
+            for future in futures:
+                future.result()
+    else:
+        for img_idx, img in enumerate(images, 1):
+            process_page(img_idx, img)
+    cascade_pages.sort(key=lambda p: p["page"])
+
+    metrics.finish()
+    budgets = [r["max_tokens"] for r in metrics.requests if "max_tokens" in r]
+    if duplicates:
+        per_page = {}
+        for r in metrics.requests:
+            per_page[r["page"]] = per_page.get(r["page"], 0) + 1
+        dedup_report = {
+            "max_distance": dedup,
+            "groups": {rep.stem: [p.stem for p in others] for rep, others in duplicates.items()},
+            "pages_linked": sum(len(others) for others in duplicates.values()),
+            "requests_avoided": sum(per_page.get(rep.stem, 0) * len(others) for rep, others in duplicates.items()),
+        }
+        metrics.add_section("dedup", dedup_report)
+    if budgets:
+        metrics.add_section("planner", {
+            "exact_tokens": exact_tokens,
+            "default_max_tokens": max_tokens,
+            "min_max_tokens": min(budgets),
+            "max_max_tokens": max(budgets),
+            "requeued_truncations": plan_stats["requeued"],
+            "requests_with_hints_fitted": plan_stats["hints_fitted"],
+        })
+    if cascade:
+        cascade_report = summarize_cascade(cascade_pages, families, metrics, history)
+        metrics.add_section("cascade", cascade_report)
+    layouts = None
+    if hint_sheet and hints:
+        layouts = compare_hint_layouts(metrics, run_hints, output_dir, ref_dir, output_root / "ocr_reports")
+        if layouts:
+            metrics.add_section("hint_layouts", layouts)
+    # Runs limited to some families (e.g. ocr-experiment cells) can share a label and start time
+    tag = "_".join(families) if wanted_families != MODEL_FAMILIES else ""
+    report_file = metrics.write_report(output_root / "ocr_reports", tag)
+    metrics.log_summary()
+    if cascade:
+        log.info("  Cascade: %d/%d pages escalated (%.0f%%), %d requests skipped, "
+                 "~%.1fs model latency and ~$%.4f saved",
+                 cascade_report["escalated"], cascade_report["pages"],
+                 cascade_report["escalation_rate"] * 100, cascade_report["requests_saved"],
+                 cascade_report["latency_saved_sec"], cascade_report["cost_saved"])
+        if cascade_report["latency_unknown_requests"]:
+            log.info("  (latency not estimated for %d skipped requests: no earlier runs of those models)",
+                     cascade_report["latency_unknown_requests"])
+    if hint_sheet and hints:
+        if layouts:
+            log.info("  Hint sheet vs separate hints (run '%s' from %s):",
+                     layouts["baseline_label"] or "unlabelled", layouts["baseline_started"])
+            for family, stats in layouts["families"].items():
+                accuracy = (f", CER {stats['sheet_cer'] * 100:.2f}% vs {stats['separate_cer'] * 100:.2f}% "
+                            f"on {stats['scored_pages']} pages" if "sheet_cer" in stats else "")
+                log.info("    %s: %.2fs vs %.2fs per request (%+.2fs) on %d pages%s", family,
+                         stats["sheet_latency"], stats["separate_latency"],
+                         -stats["latency_saved_per_request"], stats["pages"], accuracy)
+        else:
+            log.info("  Hint sheet: no earlier separate-hints run to compare latency and accuracy with "
+                     "(needs the same prompt, hints and models, full pages, and a label whose "
+                     "transcripts have not been overwritten since)")
+    if budgets:
+        log.info("  max_tokens sized %d-%d per page, %d truncated responses retried, "
+                 "%d requests had hints shrunk or dropped",
+                 min(budgets), max(budgets), plan_stats["requeued"], plan_stats["hints_fitted"])
+    if duplicates:
+        log.info("  Dedup: %d near-duplicate pages linked, %d requests avoided",
+                 dedup_report["pages_linked"], dedup_report["requests_avoided"])
+    log.info("  Report saved to %s", report_file)
+    return metrics
+
+
+def rerun_ocr(source_dir: str, label: str = "", worst: int = None, cer_threshold: float = None, **kwargs):
+    """
+    Re-OCR only the pages that scored worst in the stored ocr-eval results.
+
+    Candidates are the (page, model) outputs for this label in the scores
+    `herbert ocr-eval` stored (output/ocr_eval.json by default, or
+    <output_root>/ocr_eval.json when run_ocr is given an output_root); see
+    select_reruns() for how worst/cer_threshold pick them. The chosen pairs
+    are rerun with run_ocr(**kwargs), then rescored from where run_ocr wrote
+    them and merged back into the stored scores. Returns the run metrics
+    (None if nothing needed rerunning).
+    """
+    # Scores and reference pages use the same defaults as `herbert ocr-eval`;
+    # rerun transcripts are rescored from wherever run_ocr writes them
+    output_root = kwargs.get("output_root")
+    if output_root:
+        eval_file = Path(output_root) / "ocr_eval.json"
+        ocr_dir = Path(output_root) / "ocr_pages"
+    else:
+        eval_file = EVAL_FILE
+        ocr_dir = Path(__file__).resolve().parents[2] / "output" / "ocr_pages"
+    scores = load_scores(eval_file)
+    if not scores["pages"]:
+        log.warning("No stored scores in %s; run `herbert ocr` and `herbert ocr-eval` first", eval_file)
+        return None
+
+    suffix = f"_{label}" if label else ""
+    variants = {f"{family}{suffix}": family for family in MODEL_FAMILIES}
+    rows = select_reruns(scores, variants, worst, cer_threshold)
+    candidates = sum(1 for r in scores["pages"] if r["variant"] in variants)
+    if not rows:
+        log.info("✅ None of the %d scored page/model pairs need rerunning", candidates)
+        return None
+
+    log.info("🔁 Rerunning %d of %d scored page/model pairs:", len(rows), candidates)
+    for row in rows:
+        log.info("  %-10s %-20s CER %6.2f%%", row["page"], row["variant"], row["cer"] * 100)
+    only = {(row["page"], variants[row["variant"]]) for row in rows}
+    metrics = run_ocr(source_dir, label, only=only, **kwargs)
 
-    print(f"\n🔍 DEBUG: ===== OCR run completed =====")
-    print(f"🔍 DEBUG: Processed {len(images)} images with {len([f for f in MODEL_FAMILIES if f in model_ids])} models")
+    log.info("\n📊 Rescoring rerun pages:")
+    update_scores(eval_file, ocr_dir, REF_DIR, [(row["page"], row["variant"]) for row in rows])
+    return metrics
@@ -0,0 +1,275 @@
+"""
+Score OCR output against the manually transcribed pages.
+
+Each output/ocr_pages/pageNNN_<model>[_label].txt is compared with the
+matching output/txt/pageNNN.txt (written by `herbert extract`). Character
+and word error rates use a bit-parallel edit distance (Myers/Hyyrö), which
+handles a whole page in a few thousand big-int operations, so hundreds of
+pages x models score in seconds.
+"""
+import difflib
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from herbert.log import get_logger
+
+log = get_logger("ocr_eval")
+
+OCR_DIR = Path("output") / "ocr_pages"
+REF_DIR = Path("output") / "txt"
+EVAL_FILE = Path("output") / "ocr_eval.json"
+
+# pageNNN_<family>[_<label>].txt
+_OCR_NAME_RE = re.compile(r"^(?P<page>[^_]+)_(?P<family>[a-z]+)(?:_(?P<label>.+))?\.txt$")
+
+
+def edit_distance(a, b) -> int:
+    """
+    Levenshtein distance between two sequences (strings or lists of tokens).
+
+    Bit-parallel algorithm (Myers 1999, Hyyrö 2001): each column of the DP
+    matrix is held as vertical +1/-1 delta bit-vectors over the pattern, so
+    one step per symbol of `b` updates all len(a) cells at once. Python's
+    arbitrary precision ints remove the machine-word length limit.
+    """
+    if len(a) < len(b):
+        a, b = b, a  # shorter sequence as text keeps the loop short
+    m = len(a)
+    if m == 0:
+        return len(b)
+    if not b:
+        return m
+
+    peq = {}
+    bit = 1
+    for symbol in a:
+        peq[symbol] = peq.get(symbol, 0) | bit
+        bit <<= 1
+
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv = mask
+    mv = 0
+    score = m
+    for symbol in b:
+        eq = peq.get(symbol, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+    return score
+
+
+def normalize_transcript(text: str) -> str:
+    """
+    Normalize layout differences that are not OCR errors.
+
+    Typographic quotes/dashes become ASCII, runs of spaces collapse, and
+    blank lines are dropped (the PDF-extracted reference has none).
+    """
+    text = (text.replace("’", "'").replace("‘", "'")
+                .replace("“", '"').replace("”", '"')
+                .replace("–", "-").replace("—", "-"))
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    return "\n".join(line for line in lines if line)
+
+
+def _line_hotspots(ref_lines: list, hyp_lines: list, limit: int) -> list:
+    """Pair up reference/OCR lines and return the worst pairs by edit distance."""
+    pairs = []
+    matcher = difflib.SequenceMatcher(None, ref_lines, hyp_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        ref_block = ref_lines[i1:i2]
+        hyp_block = hyp_lines[j1:j2]
+        for k in range(max(len(ref_block), len(hyp_block))):
+            ref = ref_block[k] if k < len(ref_block) else ""
+            hyp = hyp_block[k] if k < len(hyp_block) else ""
+            pairs.append({
+                "line": i1 + min(k, max(len(ref_block) - 1, 0)) + 1,
+                "distance": edit_distance(ref, hyp),
+                "expected": ref,
+                "got": hyp,
+            })
+    pairs.sort(key=lambda p: p["distance"], reverse=True)
+    return pairs[:limit]
+
+
+def score_page(reference: str, hypothesis: str, hotspots: int = 3) -> dict:
+    """Character/word error counts and rates for one OCR page."""
+    ref = normalize_transcript(reference)
+    hyp = normalize_transcript(hypothesis)
+    ref_words = ref.split()
+    hyp_words = hyp.split()
+
+    char_errors = edit_distance(ref, hyp)
+    word_errors = edit_distance(ref_words, hyp_words)
+    result = {
+        "chars": len(ref),
+        "words": len(ref_words),
+        "char_errors": char_errors,
+        "word_errors": word_errors,
+        "cer": char_errors / len(ref) if ref else float(bool(hyp)),
+        "wer": word_errors / len(ref_words) if ref_words else float(bool(hyp_words)),
+        "ref_lines": ref.count("\n") + 1 if ref else 0,
+        "ocr_lines": hyp.count("\n") + 1 if hyp else 0,
+    }
+    if hotspots:
+        result["hotspots"] = _line_hotspots(ref.split("\n"), hyp.split("\n"), hotspots)
+    return result
+
+
+def find_ocr_outputs(ocr_dir: Path, ref_dir: Path) -> list:
+    """List (page, variant, ocr_file, ref_file) for OCR outputs with a reference page."""
+    found = []
+    for ocr_file in sorted(Path(ocr_dir).glob("*.txt")):
+        match = _OCR_NAME_RE.match(ocr_file.name)
+        if not match:
+            continue
+        ref_file = Path(ref_dir) / f"{match['page']}.txt"
+        if not ref_file.exists():
+            log.debug("No reference transcript for %s", ocr_file.name)
+            continue
+        variant = match["family"] + (f"_{match['label']}" if match["label"] else "")
+        found.append((match["page"], variant, ocr_file, ref_file))
+    return found
+
+
+def _score_files(job):
+    page, variant, ocr_file, ref_file, hotspots = job
+    reference = Path(ref_file).read_text(encoding="utf-8")
+    hypothesis = Path(ocr_file).read_text(encoding="utf-8")
+    result = score_page(reference, hypothesis, hotspots)
+    result.update({"page": page, "variant": variant, "file": str(ocr_file)})
+    return result
+
+
+def summarize_scores(pages: list) -> dict:
+    """Per-variant aggregates (micro-averaged over characters/words)."""
+    variants = {}
+    for row in pages:
+        agg = variants.setdefault(row["variant"], {
+            "pages": 0, "chars": 0, "words": 0, "char_errors": 0, "word_errors": 0,
+            "worst_page": None, "worst_cer": -1.0,
+        })
+        agg["pages"] += 1
+        for key in ("chars", "words", "char_errors", "word_errors"):
+            agg[key] += row[key]
+        if row["cer"] > agg["worst_cer"]:
+            agg["worst_cer"] = row["cer"]
+            agg["worst_page"] = row["page"]
+    for agg in variants.values():
+        agg["cer"] = agg["char_errors"] / agg["chars"] if agg["chars"] else 0.0
+        agg["wer"] = agg["word_errors"] / agg["words"] if agg["words"] else 0.0
+    return variants
+
+
+def evaluate(ocr_dir: Path = OCR_DIR, ref_dir: Path = REF_DIR, hotspots: int = 3,
+             workers: int = None) -> dict:
+    """Score every OCR output that has a reference page; returns pages + summary."""
+    jobs = [(page, variant, str(ocr_file), str(ref_file), hotspots)
+            for page, variant, ocr_file, ref_file in find_ocr_outputs(ocr_dir, ref_dir)]
+    if len(jobs) > 8 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pages = list(pool.map(_score_files, jobs, chunksize=4))
+    else:
+        pages = [_score_files(job) for job in jobs]
+    return {"pages": pages, "summary": summarize_scores(pages)}
+
+
+def load_scores(eval_file: Path = EVAL_FILE) -> dict:
+    """Load a previously written evaluation (empty result if none)."""
+    eval_file = Path(eval_file)
+    if not eval_file.exists():
+        return {"pages": [], "summary": {}}
+    with open(eval_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def select_reruns(scores: dict, variants, worst: int = None, cer_threshold: float = None) -> list:
+    """
+    Pick stored page scores worth redoing, worst first.
+
+    Only rows for the given variants are considered. worst takes the N rows
+    with the highest CER; cer_threshold takes every row whose CER is above
+    that fraction (e.g. 0.05 for more than 5% of characters wrong). Given
+    both, the union is returned.
+    """
+    rows = sorted((r for r in scores.get("pages", []) if r["variant"] in variants),
+                  key=lambda r: r["cer"], reverse=True)
+    chosen = [r for r in rows if cer_threshold is not None and r["cer"] > cer_threshold]
+    for row in rows[:worst or 0]:
+        if row not in chosen:
+            chosen.append(row)
+    return sorted(chosen, key=lambda r: r["cer"], reverse=True)
+
+
+def update_scores(eval_file: Path, ocr_dir: Path, ref_dir: Path, pairs: list, hotspots: int = 3) -> dict:
+    """
+    Rescore just the given (page, variant) outputs and merge them into the
+    stored evaluation, so scores for every page stay current after a partial run.
+    """
+    results = load_scores(eval_file)
+    previous = {(r["page"], r["variant"]): r for r in results["pages"]}
+    for page, variant in pairs:
+        ocr_file = Path(ocr_dir) / f"{page}_{variant}.txt"
+        ref_file = Path(ref_dir) / f"{page}.txt"
+        if not ocr_file.exists() or not ref_file.exists():
+            log.warning("Cannot rescore %s (%s): missing %s", page, variant,
+                        ocr_file if not ocr_file.exists() else ref_file)
+            continue
+        row = _score_files((page, variant, str(ocr_file), str(ref_file), hotspots))
+        old = previous.get((page, variant))
+        if old:
+            log.info("  %-10s %-20s CER %6.2f%% -> %6.2f%%", page, variant, old["cer"] * 100, row["cer"] * 100)
+        previous[(page, variant)] = row
+
+    results["pages"] = sorted(previous.values(), key=lambda r: (r["page"], r["variant"]))
+    results["summary"] = summarize_scores(results["pages"])
+    eval_file = Path(eval_file)
+    eval_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(eval_file, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    log.info("  Scores updated in %s", eval_file)
+    return results
+
+
+def run_eval(ocr_dir: str = str(OCR_DIR), ref_dir: str = str(REF_DIR),
+             json_file: str = str(EVAL_FILE), hotspots: int = 3) -> dict:
+    """Evaluate OCR output, log a per-page/per-model table and save JSON scores."""
+    results = evaluate(Path(ocr_dir), Path(ref_dir), hotspots)
+    if not results["pages"]:
+        log.warning("No OCR outputs in %s with matching reference pages in %s", ocr_dir, ref_dir)
+        return results
+
+    log.info("%-10s %-20s %8s %8s %7s", "page", "model", "CER", "WER", "lines")
+    for row in sorted(results["pages"], key=lambda r: (r["page"], r["variant"])):
+        log.info("%-10s %-20s %7.2f%% %7.2f%% %3d/%-3d", row["page"], row["variant"],
+                 row["cer"] * 100, row["wer"] * 100, row["ocr_lines"], row["ref_lines"])
+        for spot in row.get("hotspots", []):
+            log.debug("    line %d (%d edits): expected '%s' got '%s'",
+                      spot["line"], spot["distance"], spot["expected"], spot["got"])
+
+    log.info("\n📊 Per-model accuracy:")
+    for variant, agg in sorted(results["summary"].items(), key=lambda kv: kv[1]["cer"]):
+        log.info("  %-20s CER %6.2f%%  WER %6.2f%%  over %d pages (worst: %s at %.2f%%)",
+                 variant, agg["cer"] * 100, agg["wer"] * 100, agg["pages"],
+                 agg["worst_page"], agg["worst_cer"] * 100)
+
+    json_path = Path(json_file)
+    json_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    log.info("  Scores saved to %s", json_path)
+    return results
@@ -0,0 +1,112 @@
+"""
+Render OCR transcripts into site pages as soon as each one completes.
+
+PagePublisher plugs into run_ocr(on_page=...) and runs every finished
+transcript through the extractor's page cleaning, comment matching and
+<p data-line> rendering. The result is the same html/txt/comments layout
+that `herbert extract` produces from the manual transcript, written
+incrementally under output/ocr_site/<variant>/ while the OCR run is
+still going.
+"""
+import json
+import re
+import threading
+from pathlib import Path
+
+from herbert.comment_shards import write_shards
+from herbert.extractor import ensure_docx_for_comments, extract_comments_simple, process_page
+from herbert.log import get_logger
+
+log = get_logger("pipeline")
+
+SITE_DIR = Path("output") / "ocr_site"
+
+
+def page_number(stem: str):
+    """Page number from an image stem like "page012" (None if it has no digits)."""
+    match = re.search(r"(\d+)", stem)
+    return int(match.group(1)) if match else None
+
+
+def page_order(stem: str) -> tuple:
+    """Sort key putting pages in page-number order (stems without a number last)."""
+    number = page_number(stem)
+    return (number is None, number or 0, stem)
+
+
+class PagePublisher:
+    """Turn OCR transcripts into html/txt pages (plus comments JSON) per variant."""
+
+    def __init__(self, site_dir: Path = SITE_DIR, comments_source: str = None):
+        self.site_dir = Path(site_dir)
+        self.comments = {}
+        self.comment_anchors = {}
+        if comments_source:
+            comment_data = extract_comments_simple(ensure_docx_for_comments(comments_source))
+            self.comments = comment_data["comments"]
+            self.comment_anchors = comment_data["comment_data"]
+            log.info("Loaded %d comments (%d with context) from %s",
+                     len(self.comments), len(self.comment_anchors), comments_source)
+        self.texts = {}    # variant -> {stem: transcript}
+        self.claimed = {}  # variant -> {stem: comment IDs linked on that page}
+        self.metadata = {}
+        self._lock = threading.Lock()
+
+    def publish(self, stem: str, variant: str, text: str) -> Path:
+        """
+        Render one transcript; returns the HTML path.
+
+        A comment links only to the first page (in page order) that matches
+        its anchor, as in `herbert extract`. Pages can finish in any order
+        with --concurrency, so when a page arrives before pages already
+        published after it, those later pages are matched again and rewritten
+        if their links changed.
+        """
+        with self._lock:
+            texts = self.texts.setdefault(variant, {})
+            texts[stem] = text
+            claimed = self.claimed.setdefault(variant, {})
+            ordered = sorted(texts, key=page_order)
+            position = ordered.index(stem)
+            used = set()
+            for earlier in ordered[:position]:
+                used |= claimed[earlier]
+            for later in ordered[position:]:
+                before = claimed.get(later)
+                clean_text, html_content, page_comments = process_page(
+                    texts[later], self.comment_anchors, self.comments, used
+                )
+                claimed[later] = {c["id"][1:] for c in page_comments}
+                if later != stem and claimed[later] == before:
+                    continue
+                self._write(later, variant, clean_text, html_content, page_comments)
+                if later != stem:
+                    log.info("🌐 Relinked %s (%s) after earlier page %s arrived", later, variant, stem)
+        return self.site_dir / variant / "html" / f"{stem}.html"
+
+    def _write(self, stem: str, variant: str, clean_text: str, html_content: str, page_comments: list) -> None:
+        html_dir = self.site_dir / variant / "html"
+        txt_dir = self.site_dir / variant / "txt"
+        html_dir.mkdir(parents=True, exist_ok=True)
+        txt_dir.mkdir(parents=True, exist_ok=True)
+        self.metadata.setdefault(variant, {})[stem] = {
+            "page": page_number(stem) or stem,
+            "comments": [{"id": c["id"], "text": c["text"]} for c in page_comments],
+        }
+        html_path = html_dir / f"{stem}.html"
+        with open(html_path, "w", encoding="utf-8") as f:
+            f.write(html_content)
+        with open(txt_dir / f"{stem}.txt", "w", encoding="utf-8") as f:
+            f.write(clean_text)
+        log.info("🌐 Published %s (%s) -> %s (%d comments)", stem, variant, html_path, len(page_comments))
+
+    def close(self) -> None:
+        """Write the comments JSON and its per-page shards for each variant, in page order."""
+        with self._lock:
+            for variant, pages in self.metadata.items():
+                json_path = self.site_dir / variant / "comments.json"
+                ordered = [pages[stem] for stem in sorted(pages, key=page_order)]
+                with open(json_path, "w", encoding="utf-8") as f:
+                    json.dump(ordered, f, indent=2)
+                write_shards(ordered, self.site_dir / variant / "comments")
+                log.info("🌐 %d pages published for %s, comments in %s", len(ordered), variant, json_path)
@@ -0,0 +1,190 @@
+"""
+Plan each OCR request before it is sent.
+
+- Input tokens are estimated locally (image area / 750, ~4 characters per
+  text token) or counted exactly with the token-counting endpoint.
+- max_tokens is sized from the output lengths recorded in recent run
+  reports for the same page and model ID (or, for new pages, the model's
+  typical page) instead of a fixed budget for every page. Only reports of
+  runs against the same API endpoint count, so mock and benchmark runs
+  never size real requests.
+- Payloads that would exceed the API's request size limit have their hint
+  images shrunk and, if that is not enough, hint examples dropped.
+- Responses cut off at max_tokens are retried with a larger budget
+  (see next_budget()).
+"""
+import base64
+import io
+import json
+import math
+import os
+from pathlib import Path
+
+from herbert.hint_sheet import estimate_image_tokens, image_size
+from herbert.log import get_logger
+from herbert.metrics import DEFAULT_API_URL, REPORT_DIR, percentile
+
+log = get_logger("planner")
+
+# Optional dependency: only needed to shrink hint images (pip install herbert[tiles])
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+API_PAYLOAD_LIMIT = 10 * 1024 * 1024
+# Leave room for headers and JSON framing the size estimate doesn't see
+PAYLOAD_BUDGET = int(API_PAYLOAD_LIMIT * 0.95)
+
+MIN_OUTPUT_TOKENS = 512
+MAX_OUTPUT_TOKENS = 8192
+# Budget = longest output seen for the page x this, so normal variation never truncates
+OUTPUT_HEADROOM = 1.3
+# Scale applied to hint images before any are dropped
+HINT_SHRINK_SCALE = 0.5
+# Only the newest reports are read, so startup cost doesn't grow with every run
+HISTORY_REPORTS = 50
+
+
+def estimate_content_tokens(content: list) -> int:
+    """Local input token estimate for a list of content blocks."""
+    tokens = 0
+    for block in content:
+        if block.get("type") == "text":
+            tokens += len(block.get("text", "")) // 4 + 1
+        elif block.get("type") == "image" and block.get("source", {}).get("type") == "base64":
+            try:
+                # The PNG header is all image_size() needs
+                width, height = image_size(base64.b64decode(block["source"]["data"][:64]))
+                tokens += estimate_image_tokens(width, height)
+            except ValueError:
+                tokens += 1600  # roughly a full-size image
+    return tokens
+
+
+def count_input_tokens(client, model: str, content: list, exact: bool = False) -> int:
+    """Input tokens for a request: counted by the API when exact, else estimated locally."""
+    if exact:
+        try:
+            counted = client.messages.count_tokens(model=model, messages=[{"role": "user", "content": content}])
+            return counted.input_tokens
+        except Exception as e:
+            log.debug("Token counting failed, estimating locally: %s: %s", type(e).__name__, e)
+    return estimate_content_tokens(content)
+
+
+def payload_bytes(model: str, max_tokens: int, content: list) -> int:
+    """Size of the JSON request body."""
+    payload = {"model": model, "max_tokens": max_tokens, "messages": [{"role": "user", "content": content}]}
+    return len(json.dumps(payload).encode("utf-8"))
+
+
+def _shrink_image(block: dict, scale: float) -> dict:
+    """Copy of an image block with the PNG scaled down."""
+    with Image.open(io.BytesIO(base64.b64decode(block["source"]["data"]))) as img:
+        size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+        buf = io.BytesIO()
+        img.resize(size, Image.LANCZOS).save(buf, format="PNG", optimize=True)
+    return {"type": "image",
+            "source": {"type": "base64", "media_type": "image/png",
+                       "data": base64.b64encode(buf.getvalue()).decode("utf-8")}}
+
+
+def fit_hints(build, hints: list, model: str, max_tokens: int, budget: int = PAYLOAD_BUDGET):
+    """
+    Fit a request under the payload budget by shrinking, then dropping, hints.
+
+    build(hints) returns the request content for a list of hint blocks, which
+    come in (label, image, transcription) triples. Returns (content, hints,
+    action) where action describes what was changed (None if nothing).
+    """
+    content = build(hints)
+    size = payload_bytes(model, max_tokens, content)
+    if size <= budget or not hints:
+        return content, hints, None
+
+    if Image is not None:
+        hints = [_shrink_image(b, HINT_SHRINK_SCALE) if b["type"] == "image" else b for b in hints]
+        content = build(hints)
+        shrunk_size = payload_bytes(model, max_tokens, content)
+        log.debug("Shrinking hint images: %d -> %d bytes", size, shrunk_size)
+        if shrunk_size <= budget:
+            return content, hints, f"hint images scaled to {HINT_SHRINK_SCALE:.0%}"
+        size = shrunk_size
+
+    examples = len(hints) // 3
+    while hints and size > budget:
+        hints = hints[:-3]
+        content = build(hints)
+        size = payload_bytes(model, max_tokens, content)
+    action = f"{examples - len(hints) // 3} of {examples} hint examples dropped"
+    if size > budget:
+        log.error("❌ Request is %d bytes even without hints (budget %d)", size, budget)
+    return content, hints, action
+
+
+def next_budget(max_tokens: int) -> int:
+    """Larger max_tokens for retrying a truncated response (0 when already at the ceiling)."""
+    if max_tokens >= MAX_OUTPUT_TOKENS:
+        return 0
+    return min(max_tokens * 2, MAX_OUTPUT_TOKENS)
+
+
+class OutputHistory:
+    """Output token counts and latencies from recent run reports, for sizing max_tokens."""
+
+    def __init__(self, report_dir: Path = REPORT_DIR, base_url: str = None, max_reports: int = HISTORY_REPORTS):
+        base_url = base_url or os.environ.get("ANTHROPIC_BASE_URL") or DEFAULT_API_URL
+        self.pages = {}      # (page, model ID) -> longest complete output
+        self.truncated = {}  # (page, model ID) -> longest output that hit max_tokens
+        self.models = {}     # model ID -> complete output lengths across all pages
+        self.latencies = {}  # (page, model ID) -> latencies of complete responses
+        # Report names start with a timestamp, so the last ones are the newest
+        reports = sorted(Path(report_dir).glob("run_*.json"))[-max_reports:]
+        used = 0
+        for report_file in reports:
+            try:
+                with open(report_file, "r", encoding="utf-8") as f:
+                    report = json.load(f)
+            except (OSError, ValueError) as e:
+                log.debug("Skipping unreadable report %s: %s", report_file, e)
+                continue
+            # Reports without an endpoint predate it being recorded and may be mock runs
+            if report.get("summary", {}).get("api_base_url") != base_url:
+                continue
+            used += 1
+            for r in report.get("requests", []):
+                # Band requests from tiled runs are not comparable with full pages
+                if not r.get("ok") or not r.get("output_tokens") or r.get("tiles") or not r.get("model"):
+                    continue
+                key = (r["page"], r["model"])
+                if r.get("stop_reason") == "max_tokens":
+                    self.truncated[key] = max(self.truncated.get(key, 0), r["output_tokens"])
+                else:
+                    self.pages[key] = max(self.pages.get(key, 0), r["output_tokens"])
+                    self.models.setdefault(r["model"], []).append(r["output_tokens"])
+                    if not r.get("cached"):
+                        self.latencies.setdefault(key, []).append(r["latency"])
+        log.debug("Output history: %d page/model pairs from %d of %d recent reports (%s)",
+                  len(self.pages), used, len(reports), base_url)
+
+    def budget(self, page: str, model: str, default: int) -> int:
+        """max_tokens for a page: its own history, else the model's p95 page, else default."""
+        key = (page, model)
+        if key in self.pages:
+            seen = self.pages[key]
+        elif key in self.truncated:
+            # Only a lower bound is known, so start from the next retry budget
+            return next_budget(self.truncated[key]) or MAX_OUTPUT_TOKENS
+        elif self.models.get(model):
+            seen = percentile(self.models[model], 95)
+        else:
+            return default
+        return max(MIN_OUTPUT_TOKENS, min(MAX_OUTPUT_TOKENS, math.ceil(seen * OUTPUT_HEADROOM)))
+
+    def latency(self, page: str, model: str):
+        """Mean latency seen for the page with this model, else for the model on any page (None if unseen)."""
+        samples = self.latencies.get((page, model))
+        if not samples:
+            samples = [v for (_, m), values in self.latencies.items() if m == model for v in values]
+        return sum(samples) / len(samples) if samples else None
@@ -0,0 +1,59 @@
+"""
+On-disk cache of completed OCR responses.
+
+Entries are keyed on the model ID and the exact request content (prompt,
+hints and page image), so any run that would send an identical request,
+such as another variant in `herbert ocr-experiment` or a repeated sweep,
+reuses the earlier transcript instead of paying for it again. Only
+complete responses are stored; truncated ones are always retried.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from herbert.log import get_logger
+
+log = get_logger("result_cache")
+
+RESULT_CACHE_DIR = Path("output") / "cache" / "ocr_results"
+
+
+class ResultCache:
+    """Thread-safe JSON-file cache of OCR results."""
+
+    def __init__(self, cache_dir: Path = RESULT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, content: list) -> str:
+        digest = hashlib.sha256(model.encode("utf-8"))
+        digest.update(json.dumps(content, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """The stored result for key, or None."""
+        path = self.cache_dir / f"{key}.json"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            result = None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def put(self, key: str, result: dict) -> None:
+        path = self.cache_dir / f"{key}.json"
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        tmp_path.replace(path)
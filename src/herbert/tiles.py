@@ -0,0 +1,155 @@
+"""
+Split page scans into horizontal bands for tiled OCR, and stitch the
+band transcripts back together.
+
+Bands are cut in the gaps between handwritten lines, and each band extends
+about one line past its cut so the line either side of a cut is
+transcribed by both neighbours. stitch_transcripts() then drops that
+duplicated overlap by aligning the end of one band with the start of the
+next.
+"""
+import difflib
+import io
+from pathlib import Path
+
+from herbert.log import get_logger
+
+log = get_logger("tiles")
+
+# Optional dependencies: only needed for tiled OCR (pip install herbert[tiles])
+try:
+    import numpy as np
+    from PIL import Image
+except Exception:
+    np = None
+    Image = None
+
+# Lines whose similarity is at least this are treated as the same line when stitching
+LINE_MATCH_RATIO = 0.75
+# Never look further than this many lines for the overlap between two bands
+MAX_OVERLAP_LINES = 4
+
+
+def _require_imaging():
+    if np is None or Image is None:
+        raise RuntimeError("Tiled OCR needs Pillow and numpy: pip install 'herbert[tiles]'")
+
+
+def ink_profile(gray):
+    """Smoothed per-row darkness of a grayscale page array."""
+    ink = (255.0 - gray.astype(np.float32)).sum(axis=1)
+    # Smooth over a few rows so ascenders/descenders don't read as gaps
+    kernel = np.ones(9, dtype=np.float32) / 9
+    return np.convolve(ink, kernel, mode="same")
+
+
+def estimate_line_spacing(ink, min_spacing: int = 40, max_spacing: int = 400) -> int:
+    """Dominant line pitch in rows, from the autocorrelation of the ink profile."""
+    centered = ink - ink.mean()
+    max_spacing = min(max_spacing, len(centered) // 2)
+    if max_spacing <= min_spacing:
+        return max(len(ink) // 30, 1)
+    corr = np.correlate(centered, centered, mode="full")[len(centered) - 1:]
+    lag = int(np.argmax(corr[min_spacing:max_spacing])) + min_spacing
+    return lag
+
+
+def _gap_near(ink, row: int, reach: int) -> int:
+    """Row with the least ink within `reach` rows of `row`."""
+    low = max(row - reach, 0)
+    high = min(row + reach, len(ink) - 1)
+    if high <= low:
+        return min(max(row, 0), len(ink))
+    return low + int(np.argmin(ink[low:high]))
+
+
+def plan_bands(ink, bands: int) -> list:
+    """
+    Choose (top, bottom) pixel rows for each band.
+
+    Each cut goes at the emptiest row (the inter-line gap) within a line
+    pitch of an evenly spaced target. Bands then extend to the next gap one
+    line pitch beyond each cut, so the lines either side of a cut appear
+    whole in both neighbouring bands.
+    """
+    height = len(ink)
+    if bands <= 1:
+        return [(0, height)]
+
+    spacing = estimate_line_spacing(ink)
+    cuts = []
+    for k in range(1, bands):
+        cut = _gap_near(ink, int(height * k / bands), spacing)
+        if 0 < cut < height and (not cuts or cut - cuts[-1] > 3 * spacing):
+            cuts.append(cut)
+    if not cuts:
+        return [(0, height)]
+
+    spans = []
+    top = 0
+    for cut in cuts:
+        spans.append((top, min(_gap_near(ink, cut + spacing, spacing // 2), height)))
+        top = max(_gap_near(ink, cut - spacing, spacing // 2), 0)
+    spans.append((top, height))
+    return spans
+
+
+def split_page(image_path: Path, bands: int) -> list:
+    """Cut a page scan into overlapping bands; returns a list of PNG bytes."""
+    _require_imaging()
+    with Image.open(image_path) as img:
+        img.load()
+        spans = plan_bands(ink_profile(np.asarray(img.convert("L"))), bands)
+        log.debug("Band rows for %s: %s", Path(image_path).name, spans)
+
+        crops = []
+        for top, bottom in spans:
+            buf = io.BytesIO()
+            img.crop((0, top, img.width, bottom)).save(buf, format="PNG", optimize=True)
+            crops.append(buf.getvalue())
+    return crops
+
+
+def _same_line(a: str, b: str) -> bool:
+    a = " ".join(a.split())
+    b = " ".join(b.split())
+    if not a or not b:
+        return a == b
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio() >= LINE_MATCH_RATIO
+
+
+def _overlap_length(head: list, tail: list) -> int:
+    """Largest k where the last k lines of head line up with the first k of tail."""
+    for k in range(min(len(head), len(tail), MAX_OVERLAP_LINES), 0, -1):
+        if all(_same_line(head[-k + i], tail[i]) for i in range(k)):
+            return k
+    # Partial lines at a band edge: allow the first/last line to be missing on one side
+    for k in range(min(len(head), len(tail) - 1, MAX_OVERLAP_LINES), 0, -1):
+        if all(_same_line(head[-k + i], tail[i + 1]) for i in range(k)):
+            return k + 1
+    return 0
+
+
+def stitch_transcripts(parts: list) -> str:
+    """Join band transcripts top to bottom, dropping lines duplicated in the overlaps."""
+    merged = []
+    for part in parts:
+        lines = part.strip("\n").split("\n") if part.strip() else []
+        # Blank lines at band edges are artefacts of the cut, not page structure
+        while lines and not lines[0].strip():
+            lines.pop(0)
+        if merged:
+            content = [line for line in merged if line.strip()]
+            incoming = [line for line in lines if line.strip()]
+            k = _overlap_length(content[-MAX_OVERLAP_LINES:], incoming)
+            # Skip the first k non-blank lines of the incoming band
+            skipped = 0
+            while lines and skipped < k:
+                if lines[0].strip():
+                    skipped += 1
+                lines.pop(0)
+            while lines and not lines[0].strip():
+                lines.pop(0)
+        merged.extend(lines)
+    text = "\n".join(merged).strip()
+    return text + "\n" if text else ""